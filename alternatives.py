@@ -0,0 +1,156 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+from service_catalog import SERVICE_GROUPS
+
+
+"""
+Anzahl der vorgeschlagenen Alternativen (zusätzlich zum Basisdatensatz).
+"""
+TOP_N = 4
+
+"""
+Grobe Weltregionen für den anbieterübergreifenden Vergleich; die Regionsnamen
+unterscheiden sich je Provider (z. B. "EU (Frankfurt)", "westeurope", "europe-west3").
+"""
+_AREAS = [
+    ("europe", re.compile(r"europe|^eu\b|^eu-|frankfurt|london|paris|ireland|stockholm|milan|zurich|"
+                          r"spain|germany|france|^uk|norway|sweden|switzerland|poland|italy|netherlands")),
+    ("americas", re.compile(r"^us|us\d?$|america|canada|brazil|mexico|chile|virginia|ohio|oregon|"
+                            r"california|^ca-|^sa-")),
+    ("apac", re.compile(r"asia|japan|tokyo|osaka|seoul|korea|singapore|india|mumbai|hyderabad|australia|"
+                        r"sydney|melbourne|jakarta|indonesia|hong kong|^ap-|pacific|taiwan")),
+    ("mea", re.compile(r"middle east|africa|uae|qatar|israel|saudi|^me-|^af-|dubai|tel aviv|doha|johannesburg")),
+]
+
+
+def region_area(region):
+    r = (region or "").strip().lower()
+    return next((name for name, pattern in _AREAS if pattern.search(r)), "")
+
+
+"""
+Versucht eine Instanz-Familie aus dem Namen zu extrahieren (vektorisiert):
+AWS trennt beim Punkt, Azure/GCP nehmen den ersten Block.
+"""
+def _families(resource_name, sku):
+    text = resource_name.astype(object).fillna("") + " " + sku.astype(object).fillna("")
+    by_dot = text.str.split(".", n=1).str[0].str.strip()
+    by_word = text.str.strip().str.split(n=1).str[0]
+    return pd.Series(np.where(text.str.contains(".", regex=False), by_dot, by_word)).fillna("")
+
+
+"""
+Alternativen-Suche auf einem Preis-Snapshot (snapshot.PriceSnapshot). Familie,
+Service-Gruppe und Weltregion werden einmal je Snapshot als Codes berechnet;
+eine Anfrage besteht dann nur aus Array-Vergleichen, einer Score-Berechnung
+und argpartition für die besten TOP_N.
+"""
+class AlternativesEngine:
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        df = snapshot.df
+        self.positions = pd.Index(snapshot.ids)
+        families = df["family"].astype(object).where(df["family"].notna(),
+                                                     _families(df["resource_name"], df["sku"]))
+        self.family, _ = pd.factorize(families)
+        self.family_empty = (families == "").to_numpy()
+
+        groups = [SERVICE_GROUPS.get(c, "") for c in df["canonical_service"].cat.categories]
+        self.group, self.no_group = self._lookup(df["canonical_service"], groups)
+        areas = [region_area(r) for r in df["region"].cat.categories]
+        self.area, _ = self._lookup(df["region"], areas)
+
+    """
+    Übersetzt die Kategorie-Codes einer Spalte über eine Tabelle in neue Codes
+    (NULL → ""), damit Gruppenvergleiche reine Integer-Vergleiche sind.
+    Gibt (Codes je Zeile, Code für "") zurück.
+    """
+    @staticmethod
+    def _lookup(column, values):
+        codes, _ = pd.factorize(pd.Series(list(values) + [""], dtype=object))
+        return codes[column.cat.codes.to_numpy()], codes[-1]
+
+    def _region_mask(self, region):
+        region = region or ""
+        prefix = (region.split("-")[0] + "-") if "-" in region else region
+        return self.snapshot._match("region", lambda cats: (cats == region.lower())
+                                    | (cats.str.startswith(prefix.lower()) if prefix else False))
+
+    """
+    Kandidaten-Maske: gleicher Provider und Service in derselben Region bzw.
+    Regionsgruppe (Präfix) oder – mit cross_provider – gleiche Service-Gruppe
+    in derselben Weltregion bei allen Anbietern.
+    """
+    def candidates(self, pos, cross_provider=False):
+        snap = self.snapshot
+        if cross_provider and self.group[pos] != self.no_group:
+            mask = self.group == self.group[pos]
+            region = snap.df["region"].iat[pos]
+            if region_area(region):
+                mask &= self.area == self.area[pos]
+            else:
+                mask &= snap.codes["region"] == snap.codes["region"][pos]
+        else:
+            mask = (snap.codes["provider"] == snap.codes["provider"][pos]) \
+                & (snap.codes["service"] == snap.codes["service"][pos])
+            mask &= self._region_mask(snap.df["region"].iat[pos])
+        mask[pos] = False
+        return np.flatnonzero(mask)
+
+    """
+    Gibt (base, items) zurück wie app.compute_alternatives: Basisdatensatz und
+    Liste aus Basis + TOP_N Alternativen mit Score und Preisunterschied.
+    """
+    def compute(self, entry_id, cross_provider=False, top_n=TOP_N):
+        try:
+            pos = self.positions.get_loc(int(entry_id))
+        except KeyError:
+            return None, []
+        snap = self.snapshot
+        base = snap.rows([pos])[0]
+        base_price = float(snap.prices[pos]) if not np.isnan(snap.prices[pos]) else 0.0
+
+        cand = self.candidates(pos, cross_provider)
+        prices = np.nan_to_num(snap.prices[cand], nan=0.0)
+        same_family = (self.family[cand] == self.family[pos]) & (not self.family_empty[pos])
+        scores = np.where(same_family, 0.0, 1.0) + np.abs(prices - base_price) / (base_price or 0.00001)
+        # Größenabstand über die vCPU-Spalte (fehlende Angabe zählt halb)
+        vcpu = snap.numbers["vcpu"]
+        if vcpu[pos] > 0:
+            cand_vcpu = vcpu[cand]
+            scores += np.where(np.isnan(cand_vcpu), 0.5,
+                               np.minimum(np.abs(cand_vcpu - vcpu[pos]) / vcpu[pos], 1.0))
+
+        k = min(top_n, len(cand))
+        best = np.argpartition(scores, k - 1)[:k] if k else np.array([], dtype=int)
+        best = best[np.lexsort((prices[best], scores[best]))]
+
+        items = []
+        for row, i in zip(snap.rows(cand[best]), best):
+            delta_abs = float(prices[i]) - base_price
+            row.update(score=float(scores[i]), delta_abs=delta_abs,
+                       delta_pct=(delta_abs / base_price * 100.0) if base_price else 0.0,
+                       delta_dir="down" if delta_abs < 0 else ("up" if delta_abs > 0 else "same"))
+            items.append(row)
+
+        base_row = dict(base)
+        base_row.update(delta_abs=0.0, delta_pct=0.0, delta_dir="same", score=-1)
+        return base, [base_row] + items
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+"""
+Gibt die Alternativen-Engine zum Snapshot zurück (einmal je Snapshot aufgebaut).
+"""
+def get_engine(snapshot):
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.snapshot is not snapshot:
+            _engine = AlternativesEngine(snapshot)
+        return _engine
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+from decimal import Decimal
+from datetime import date, datetime
+from flask import Blueprint, request, make_response, g
+from db import get_prices_page, get_price_by_id
+from search import build_filters
+from response_cache import cached_response
+from snapshot import get_snapshot
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+"""
+Einstellungen der JSON-API: Standard- und Höchstanzahl Zeilen je Seite.
+"""
+API_DEFAULT_LIMIT = int(os.getenv("API_DEFAULT_LIMIT", "100"))
+API_MAX_LIMIT = int(os.getenv("API_MAX_LIMIT", "1000"))
+
+"""
+Felder, die über ?fields= ausgewählt werden können (id ist immer enthalten).
+"""
+API_FIELDS = ["id", "provider", "instance_type", "service", "canonical_service", "sku", "resource_name",
+              "region", "price_per_unit", "unit", "currency", "family", "vcpu", "memory_gib", "storage_class"]
+ALTERNATIVE_FIELDS = ["score", "delta_abs", "delta_pct", "delta_dir"]
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"nicht serialisierbar: {type(value).__name__}")
+
+
+"""
+Kompakte JSON-Antwort (orjson, falls installiert).
+"""
+def _json(payload, status=200):
+    if orjson is not None:
+        body = orjson.dumps(payload, default=_default)
+    else:
+        body = json.dumps(payload, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    response = make_response(body, status)
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+"""
+Liest ?fields= (kommagetrennt) und prüft die Namen gegen die erlaubten Felder.
+"""
+def _fields(allowed):
+    raw = (request.args.get("fields") or "").strip()
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ApiError(f"Unbekannte Felder: {', '.join(unknown)}")
+    return ["id"] + [f for f in fields if f != "id"]
+
+
+def _project(row, fields, allowed=API_FIELDS):
+    if fields is None:
+        return {f: row.get(f) for f in allowed if f in row}
+    return {f: row.get(f) for f in fields}
+
+
+def _limit():
+    raw = request.args.get("limit")
+    if not raw:
+        return API_DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError("limit muss eine Zahl sein")
+    if not 1 <= limit <= API_MAX_LIMIT:
+        raise ApiError(f"limit muss zwischen 1 und {API_MAX_LIMIT} liegen")
+    return limit
+
+
+"""
+Erzeugt den Blueprint der JSON-API unter /api/v1. compute_alternatives wird
+übergeben (liegt in app.py), damit API und HTML-Seite dieselbe Logik nutzen.
+Alle Antworten laufen über den Antwort-Cache (ETag, 304, LRU je Datenstand).
+"""
+def create_api(compute_alternatives):
+    api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+    """
+    Server-Timing-Header mit der Bearbeitungszeit jeder API-Antwort (Messung
+    im Browser/Client ohne eigenes Logging).
+    """
+    @api.before_request
+    def start_timer():
+        g.api_started = time.perf_counter()
+
+    @api.after_request
+    def server_timing(response):
+        started = g.get("api_started")
+        if started is not None:
+            response.headers["Server-Timing"] = f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+        return response
+
+    @api.errorhandler(ApiError)
+    def api_error(e):
+        return _json({"error": str(e)}, e.status)
+
+    """
+    Gefilterte, sortierte Preise mit Keyset-Cursor. Filter wie auf der
+    Startseite, dazu sort_by, order, limit, cursor und fields. Ist ein
+    Snapshot geladen, wird aus dem Speicher geantwortet; die Cursor sind in
+    beiden Wegen dieselben (Sortierwerte + id).
+    """
+    @api.route("/prices")
+    @cached_response
+    def prices():
+        fields = _fields(API_FIELDS)
+        args = (build_filters(request.args), request.args.get("sort_by", "provider"),
+                request.args.get("order", "asc"))
+        cursor, limit = request.args.get("cursor") or None, _limit()
+        snapshot = get_snapshot()
+        page = snapshot.seek_page(*args, cursor=cursor, per_page=limit) if snapshot is not None else None
+        if page is None:
+            page = get_prices_page(*args, cursor=cursor, per_page=limit)
+        rows, next_cursor, prev_cursor = page
+        return _json({
+            "data": [_project(r, fields) for r in rows],
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        })
+
+    @api.route("/prices/<int:entry_id>")
+    @cached_response
+    def price(entry_id):
+        fields = _fields(API_FIELDS)
+        row = get_price_by_id(entry_id)
+        if not row:
+            raise ApiError("Preis nicht gefunden", 404)
+        return _json({"data": _project(row, fields)})
+
+    """
+    Basisdatensatz und beste Alternativen (cross=1: über alle Anbieter).
+    """
+    @api.route("/prices/<int:entry_id>/alternatives")
+    @cached_response
+    def alternatives(entry_id):
+        allowed = API_FIELDS + ALTERNATIVE_FIELDS
+        fields = _fields(allowed)
+        base, items = compute_alternatives(entry_id, cross_provider=request.args.get("cross") == "1")
+        if not base:
+            raise ApiError("Preis nicht gefunden", 404)
+        return _json({
+            "base": _project(base, fields),
+            "data": [_project(r, fields, allowed) for r in items[1:]],
+        })
+
+    return api
@@ -1,19 +1,24 @@
-from flask import Flask, render_template, request
-from db import get_all_prices, get_filtered_prices, remove_duplicates, get_all_regions
+from flask import Flask, render_template, request, url_for, Response, stream_with_context, redirect, send_file, jsonify
+from flask import make_response, abort
+from db import get_filtered_prices, get_price_by_id, get_prices_page, estimate_filtered_count, iter_filtered_prices
+from snapshot import get_snapshot
+from alternatives import get_engine
+from facets import get_facets
+from search import build_filters
+from api import create_api
+from pdf_report import PDF_SYNC_ROWS, render_prices_pdf, report_jobs
+from response_cache import cached_response, response_cache_stats
 import threading
 import time
 import subprocess
-from update_timestamp import update_timestamp
-from flask import make_response
+from update_timestamp import update_timestamp, STAMP_FILE
 import csv
 from io import StringIO
 from fpdf import FPDF
 import webbrowser
 import sys
-from flask import abort
-from db import get_price_by_id, get_filtered_prices
-import re
 import os
+import zlib
 
 app = Flask(__name__)
 
@@ -23,10 +28,11 @@ Startseite der Anwendung. Zeigt gefilterte und sortierte Preisdaten an,
 40100 Ergebnisse pro Seite und Zeitpunkt der letzten Aktualisierung.
 """
 @app.route('/')
+@cached_response
 def index():
     page = request.args.get('page', 1, type=int)
     per_page = 100
-    regions = get_all_regions()
+    facets = get_facets()
     sort_by = request.args.get("sort_by", "provider")  
     order = request.args.get("order", "asc")           
     filters = {
@@ -36,24 +42,46 @@ def index():
         "sku":      "",                                     
         "resource_name": "",                                  
         "instance_type": request.args.get("instance_type", ""),  
-        "region":   request.args.get("region", "")
+        "region":   request.args.get("region", ""),
+        "family":   request.args.get("family", ""),
+        "storage_class": request.args.get("storage_class", ""),
+        "min_vcpu": request.args.get("min_vcpu", ""),
+        "max_memory": request.args.get("max_memory", ""),
     }
-    prices = get_filtered_prices(filters, sort_by, order)
-    prices = remove_duplicates(prices)
-    total  = len(prices)
-    start  = (page - 1) * per_page
-    end    = start + per_page
-    prices = prices[start:end]
+    # Links für Vor/Zurück: Filter und Sortierung bleiben erhalten
+    nav_args = {k: v for k, v in request.args.items() if k not in ("page", "cursor")}
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        # Snapshot im Speicher: Filter, Sortierung und Seite ohne DB-Abfrage
+        page = max(1, page)
+        prices, total = snapshot.page(filters, sort_by, order, page=page, per_page=per_page)
+        prev_url = url_for('index', **nav_args, page=page - 1) if page > 1 else None
+        next_url = url_for('index', **nav_args, page=page + 1) if page * per_page < total else None
+    else:
+        cursor = request.args.get("cursor") or None
+        prices, next_cursor, prev_cursor = get_prices_page(filters, sort_by, order, cursor=cursor, per_page=per_page)
+        total  = estimate_filtered_count(filters)
+
+        prev_url = None
+        if page > 1:
+            prev_url = url_for('index', **nav_args, page=page - 1, cursor=prev_cursor) if prev_cursor and page > 2 \
+                else url_for('index', **nav_args)
+        next_url = url_for('index', **nav_args, page=page + 1, cursor=next_cursor) if next_cursor else None
   
     print("Gefundene Preise:", len(prices))
     last_updated = read_last_updated()
     return render_template('index.html', 
                            prices=prices, 
                            page=page, 
-                           total_pages=(total + per_page - 1) // per_page,
+                           total_pages=max(page, (total + per_page - 1) // per_page),
+                           prev_url=prev_url,
+                           next_url=next_url,
                            last_updated=last_updated, 
                            request=request,
-                           regions=regions)
+                           sort_by=sort_by,
+                           order=order,
+                           facets=facets,
+                           regions=facets.values("region", request.args.get("provider") or None))
 
 
 """ 
@@ -79,33 +107,22 @@ Liest den letzten Aktualisierungszeitpunkt aus der Datei 'last_updated.txt'.
 """
 def read_last_updated():
     try:
-        with open("last_updated.txt", "r") as f:
+        with open(STAMP_FILE, "r") as f:
             return f.read()
     except FileNotFoundError:
         return "unbekannt"
     
 
-"""
-Filterfunktion
-"""
-def build_filters(args):
-    return {
-        "provider":      args.get("provider", ""),
-        "q":             args.get("q", ""),
-        "service":       args.get("service", ""),
-        "sku":           args.get("sku", ""),
-        "resource_name": args.get("resource_name", ""),
-        "resource":      args.get("resource", ""),         
-        "instance_type": args.get("instance_type", ""),
-        "region":        args.get("region", ""),
-    }
-
-
 """
 Die Funktion gibt den Basisdatensatz und eine Liste mit Basis + 4 besten 
-Alternativen zurück, inkl. Preisunterschieden.
+Alternativen zurück, inkl. Preisunterschieden. Mit Snapshot rechnet die
+vektorisierte Engine (alternatives.py), optional auch über alle Anbieter.
 """
-def compute_alternatives(entry_id):
+def compute_alternatives(entry_id, cross_provider=False):
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return get_engine(snapshot).compute(entry_id, cross_provider=cross_provider)
+
     base = get_price_by_id(entry_id)
     if not base:
         return None, []
@@ -173,102 +190,129 @@ def _family_from_instance_type(name: str) -> str:
     return name.strip().split()[0]
 
 
+app.register_blueprint(create_api(compute_alternatives))
+
+
+"""
+CSV-Export komprimieren, wenn der Client gzip akzeptiert (CSV_EXPORT_GZIP=0 schaltet ab).
+"""
+CSV_EXPORT_GZIP = os.getenv("CSV_EXPORT_GZIP", "1") == "1"
+
+CSV_HEADERS = ["Anbieter", "Instance Type", "Service", "SKU", "Resource Name", "Region", "Preis", "Einheit", "Währung"]
+
+
+def _csv_values(row):
+    price = row["price_per_unit"]
+    return [
+        row["provider"],
+        row.get("instance_type", ""),
+        row["service"],
+        row["sku"],
+        row["resource_name"],
+        row["region"],
+        f'{price:.6f}' if price is not None else "",
+        row["unit"],
+        row["currency"]
+    ]
+
+
+"""
+Erzeugt die CSV-Ausgabe blockweise als Bytes: Kopfzeile sofort, danach je
+Block aus iter_filtered_prices einen Chunk (optional gzip-komprimiert).
+"""
+def _iter_csv(filters, sort_by, order, compress=False):
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf = StringIO()
+    writer = csv.writer(buf, delimiter=';')
+
+    def chunk(final=False):
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        if gz is None:
+            return data
+        return gz.compress(data) + (gz.flush() if final else gz.flush(zlib.Z_SYNC_FLUSH))
+
+    writer.writerow(CSV_HEADERS)
+    yield chunk()
+    for rows in iter_filtered_prices(filters, sort_by, order):
+        writer.writerows(_csv_values(row) for row in rows)
+        yield chunk()
+    if gz is not None:
+        yield chunk(final=True)
+
+
 """ 
-Erzeugt eine CSV-Datei mit den gefilterten Preisdaten und bietet sie zum Download an.
+Erzeugt eine CSV-Datei mit allen gefilterten Preisdaten und streamt sie zum
+Download (konstanter Speicher, erstes Byte sofort, kein Zeilenlimit).
 """
 @app.route('/download/csv')
+@cached_response
 def download_csv():
     sort_by = request.args.get("sort_by", "provider")
     order = request.args.get("order", "asc")
     filters = build_filters(request.args)
+    compress = CSV_EXPORT_GZIP and "gzip" in request.headers.get("Accept-Encoding", "").lower()
 
-
-    prices = get_filtered_prices(filters, sort_by, order)
-
-    si = StringIO()
-    writer = csv.writer(si, delimiter=';')  
-    writer.writerow(["Anbieter", "Instance Type", "Service", "SKU", "Resource Name", "Region", "Preis", "Einheit", "Währung"])
-
-    for row in prices:
-        writer.writerow([
-            row["provider"],
-            row.get("instance_type", ""),
-            row["service"],
-            row["sku"],
-            row["resource_name"],
-            row["region"],
-            f'{row["price_per_unit"]:.6f}',  
-            row["unit"],
-            row["currency"]
-        ])
-
-    output = make_response(si.getvalue())
+    output = Response(stream_with_context(_iter_csv(filters, sort_by, order, compress)),
+                      mimetype="text/csv")
     output.headers["Content-Disposition"] = "attachment; filename=Cloudpreise.csv"
     output.headers["Content-type"] = "text/csv; charset=utf-8"
+    output.headers["X-Accel-Buffering"] = "no"
+    if compress:
+        output.headers["Content-Encoding"] = "gzip"
+        output.headers["Vary"] = "Accept-Encoding"
     return output
 
 
 """ 
-Erzeugt eine PDF-Datei mit den gefilterten Preisdaten und bietet sie zum Download an.
+Erzeugt eine PDF-Datei mit den gefilterten Preisdaten (höchstens PDF_MAX_ROWS
+Zeilen). Kleine Berichte werden direkt ausgeliefert, große als Hintergrundjob
+mit Statusseite und Download-Link.
 """
 @app.route('/download/pdf')
+@cached_response
 def download_pdf():
     sort_by = request.args.get("sort_by", "provider")
     order = request.args.get("order", "asc")
     filters = build_filters(request.args)
-    prices = get_filtered_prices(filters, sort_by, order)
-
-    pdf = FPDF(orientation='L', unit='mm', format='A4')  
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    font_path = os.path.join(app.root_path, "static", "fonts", "DejaVuSans.ttf")
-    pdf.add_font("DejaVu", "", font_path, uni=True)
-    pdf.set_font("DejaVu", "", 11)
-    pdf.cell(0, 10, txt="Preisliste (gefiltert)", ln=True, align='C')
-    pdf.ln(4)
-
-    # Spaltenüberschriften 
-    headers = ["Anbieter", "Instance Type", "Service", "SKU", "Resource Name", "Region", "Preis", "Einheit", "Währung"]
-    col_widths = [25, 30, 30, 35, 80, 40, 25, 25, 20]  
-
-    # Kopfzeile
-    for i, header in enumerate(headers):
-        pdf.cell(col_widths[i], 8, header, border=1)
-    pdf.ln()
-
-    # Inhalt
-    for row in prices:
-        values = [
-            row["provider"],
-            row.get("instance_type", ""),
-            row["service"],
-            row["sku"],
-            row["resource_name"],
-            row["region"],
-            f'{row["price_per_unit"]:.6f}',
-            row["unit"],
-            row["currency"]
-        ]
-        for i, val in enumerate(values):
-            text = str(val)
-            if len(text) > 30:
-                text = text[:27] + "…"  
-            pdf.cell(col_widths[i], 8, text, border=1)
-        pdf.ln()
-
-    # PDF als HTTP-Response zurückgeben  
-    out = pdf.output(dest='S')  
-    pdf_bytes = bytes(out) if isinstance(out, (bytearray, memoryview)) else out
+
+    if estimate_filtered_count(filters) > PDF_SYNC_ROWS:
+        job_id = report_jobs().submit(filters, sort_by, order)
+        return redirect(url_for('pdf_report_status', job_id=job_id))
+
+    pdf_bytes, _, _ = render_prices_pdf(filters, sort_by, order)
     response = make_response(pdf_bytes)
     response.headers["Content-Disposition"] = "attachment; filename=Cloudpreise.pdf"
     response.headers["Content-type"] = "application/pdf"
     return response
 
 
+"""
+Statusseite eines PDF-Hintergrundjobs (lädt sich neu, bis die Datei fertig ist).
+"""
+@app.route('/download/pdf/<job_id>')
+def pdf_report_status(job_id):
+    job = report_jobs().get(job_id)
+    if not job:
+        abort(404)
+    return render_template('report_job.html', job=job, job_id=job_id)
+
+
+@app.route('/download/pdf/<job_id>/file')
+def pdf_report_file(job_id):
+    job = report_jobs().get(job_id)
+    if not job or job["status"] != "done":
+        abort(404)
+    return send_file(job["path"], mimetype="application/pdf", as_attachment=True,
+                     download_name="Cloudpreise.pdf")
+
+
 """ 
 Öffnet ein neues Fenster, wo zwei Instanzen verglichen werden.
 """
 @app.route('/compare')
+@cached_response
 def compare():
     ids = request.args.getlist('ids')
     if len(ids) != 2:
@@ -287,11 +331,13 @@ Dieser Code zeigt für einen Eintrag alternative Cloud-Preise an und
 bietet die Möglichkeit, diese direkt als CSV oder PDF herunterzuladen.
 """
 @app.route("/alternatives/<int:entry_id>")
+@cached_response
 def alternatives(entry_id):
-    base, items = compute_alternatives(entry_id)
+    cross = request.args.get("cross") == "1"
+    base, items = compute_alternatives(entry_id, cross_provider=cross)
     if not base:
         abort(404)
-    return render_template("alternatives.html", base=base, items=items)
+    return render_template("alternatives.html", base=base, items=items, cross=cross)
 
 
 def _latin(txt):
@@ -300,8 +346,9 @@ def _latin(txt):
     return str(txt).encode("latin-1", "replace").decode("latin-1")
 
 @app.route("/alternatives/<int:entry_id>/export/<string:fmt>")
+@cached_response
 def export_alternatives(entry_id, fmt):
-    base, items = compute_alternatives(entry_id)
+    base, items = compute_alternatives(entry_id, cross_provider=request.args.get("cross") == "1")
     if not base:
         abort(404)
 
@@ -393,6 +440,14 @@ def export_alternatives(entry_id, fmt):
     abort(400)
 
 
+"""
+Trefferstatistik des Antwort-Caches (JSON).
+"""
+@app.route('/stats/cache')
+def cache_stats_view():
+    return jsonify(response_cache_stats())
+
+
 """ 
 Startet die Flask-App, öffnet den Browser und startet die Datenaktualisierung im Hintergrund.
 """
@@ -1,279 +1,559 @@
 import os
 import time
 import json
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from db import insert_prices
+from aws_offer_files import AWS_SOURCE, iter_from_offer_files
+from pipeline import merge_streams, flatten
+import http_cache
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 load_dotenv()
 
 
 """
-Die Funktion holt alle Preise für Amazon EC2 aus der AWS Price List API, 
-bereitet sie auf und gibt sie als Liste zurück.
+Einstellungen für den parallelen Abruf: Anzahl gleichzeitiger Seitenströme
+(über alle Services hinweg) und Attribut, nach dem jeder Service aufgeteilt wird.
 """
-def get_aws_prices_ec2():
-    client = boto3.client(
-        'pricing',
-        region_name='us-east-1',
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-    )
-
-    prices = []
-    next_token = None
+AWS_MAX_WORKERS = int(os.getenv("AWS_MAX_WORKERS", "8"))
+AWS_SHARD_FIELD = os.getenv("AWS_SHARD_FIELD", "location")
+_MAX_RETRIES = 6
 
-    while True:
-        params = {
-            "ServiceCode": "AmazonEC2",
-            "FormatVersion": "aws_v1",
-            "MaxResults": 100,
-            "Filters": [
-                {"Type": "TERM_MATCH", "Field": "operatingSystem", "Value": "Linux"},
-                {"Type": "TERM_MATCH", "Field": "tenancy", "Value": "Shared"},
-                {"Type": "TERM_MATCH", "Field": "preInstalledSw", "Value": "NA"}
-            ]
-        }
+"""
+Rest-Durchlauf je Shard-Attribut: Produkte ohne das Attribut werden über ein
+zweites Attribut gefunden, ohne dessen regionale Werte (die tragen immer eine
+location und liegen damit in den Shards).
+"""
+_REST_PARTITIONS = {
+    "location": ("locationType", {"AWS Region"}),
+}
 
-        if next_token:
-            params["NextToken"] = next_token
+"""
+Prozesse für das Parsen und Mappen der PriceList-Seiten (0 = im Abruf-Thread).
+json.loads und das Durchlaufen der Terms sind CPU-lastig und würden sonst
+unter dem GIL mit den Abruf-Threads konkurrieren.
+"""
+AWS_PARSE_WORKERS = int(os.getenv("AWS_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
 
-        response = client.get_products(**params)
-        time.sleep(0.1)  
-        for offer_json in response["PriceList"]:
-            offer = json.loads(offer_json)
-            product = offer.get("product", {})
-            terms = offer.get("terms", {}).get("OnDemand", {})
-
-            for term in terms.values():
-                price_dimensions = term.get("priceDimensions", {})
-                for price_detail in price_dimensions.values():
-                    price_per_unit = price_detail.get("pricePerUnit", {}).get("USD")
-                    if price_per_unit:
-                        attr = product.get("attributes", {})
-                        prices.append({
-                            "provider": "AWS",
-                            "instance_type": attr.get("instanceType", "unknown"),
-                            "service": product.get("productFamily"),
-                            "sku": product.get("attributes", {}).get("instanceType") or product.get("sku"),
-                            "resource_name": f"{attr.get('instanceType', 'unknown')} | {attr.get('vcpu', '?')} vCPU | {attr.get('memory', '?')} RAM",
-                            "region": attr.get("location", "unknown"),
-                            "price_per_unit": float(price_per_unit),
-                            "unit": price_detail.get("unit"),
-                            "currency": "USD"
-                        })
+"""
+Startmethode der Parse-Prozesse. Beim Anlegen des Pools laufen bereits Abruf-
+Threads, DB-Pool und Cache-Locks; ein fork würde gehaltene Locks in die Kinder
+übernehmen. "forkserver" (bzw. "spawn") startet saubere Prozesse.
+"""
+AWS_PARSE_START_METHOD = os.getenv("AWS_PARSE_START_METHOD", "forkserver")
 
-        next_token = response.get("NextToken")
-        if not next_token:
-            break
+"""
+Versuche je Request innerhalb von botocore (Retry-Modus "standard": 5xx,
+Verbindungsabbrüche, Timeouts mit Backoff). Throttling regelt zusätzlich
+_AdaptiveThrottle in _get_products_page für alle Shards gemeinsam.
+"""
+AWS_SDK_MAX_ATTEMPTS = int(os.getenv("AWS_SDK_MAX_ATTEMPTS", "3"))
+_THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException", "RequestLimitExceeded", "Throttling"}
 
-    return prices
+_client = None
+_client_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=AWS_MAX_WORKERS, thread_name_prefix="aws-shard")
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
 
 
 """
-Die Funktion holt alle Preise für Amazon S3 aus der AWS Price List API, 
-bereitet sie auf und gibt sie als Liste zurück.
+Gibt einen gemeinsamen Pricing-Client zurück (boto3-Clients sind thread-sicher).
 """
-def get_aws_prices_s3():
-    client = boto3.client(
-        'pricing',
-        region_name='us-east-1',
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-    )
-
-    prices = []
-    next_token = None
+def _pricing_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client(
+                    'pricing',
+                    region_name='us-east-1',
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    config=Config(max_pool_connections=AWS_MAX_WORKERS * 2,
+                                  retries={"total_max_attempts": AWS_SDK_MAX_ATTEMPTS, "mode": "standard"})
+                )
+    return _client
 
-    while True:
-        params = {
-            "ServiceCode": "AmazonS3",
-            "FormatVersion": "aws_v1",
-            "MaxResults": 100,
-            "Filters": []
-        }
-        if next_token:
-            params["NextToken"] = next_token
 
-        response = client.get_products(**params)
-        time.sleep(0.1)
-
-        for offer_json in response["PriceList"]:
-            offer = json.loads(offer_json)
-            product = offer.get("product", {})
-            terms = offer.get("terms", {}).get("OnDemand", {})
-            attr = product.get("attributes", {}) or {}
-
-            for term in terms.values():
-                for price_detail in term.get("priceDimensions", {}).values():
-                    price_per_unit = price_detail.get("pricePerUnit", {}).get("USD")
-                    if not price_per_unit:
-                        continue
-                    prices.append({
-                        "provider": "AWS",
-                        "instance_type": attr.get("storageClass") or attr.get("usagetype") or "unknown",
-                        "service": product.get("productFamily") or "S3",
-                        "sku": product.get("sku"),
-                        "resource_name": f"{attr.get('storageClass', 'S3')} | {attr.get('usagetype', '')}".strip(),
-                        "region": attr.get("location", "unknown"),
-                        "price_per_unit": float(price_per_unit),
-                        "unit": price_detail.get("unit"),
-                        "currency": "USD"
-                    })
+"""
+Adaptives Throttling (AIMD): der Mindestabstand zwischen Requests wächst bei
+echten Throttling-Fehlern und schrumpft wieder, solange Requests durchgehen.
+"""
+class _AdaptiveThrottle:
 
-        next_token = response.get("NextToken")
-        if not next_token:
-            break
+    def __init__(self, min_interval=0.0, max_interval=10.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self.throttle_events = 0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def success(self):
+        with self._lock:
+            self.interval = max(self.min_interval, self.interval * 0.9 - 0.005)
+
+    def throttled(self):
+        with self._lock:
+            self.throttle_events += 1
+            self.interval = min(self.max_interval, max(self.interval * 2, 0.25))
+            self._next_slot = time.monotonic() + self.interval
 
-    return prices
+
+_throttle = _AdaptiveThrottle()
 
 
 """
-Die Funktion holt alle Preise für Amazon EBS aus der AWS Price List API, 
-bereitet sie auf und gibt sie als Liste zurück.
+Ruft eine Seite von get_products ab und wiederholt sie bei Throttling. Andere
+vorübergehende Fehler wiederholt bereits botocore (AWS_SDK_MAX_ATTEMPTS).
 """
-def get_aws_prices_ebs():
-    client = boto3.client(
-        'pricing',
-        region_name='us-east-1',
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-    )
-
-    prices = []
-    next_token = None
+def _get_products_page(params):
+    client = _pricing_client()
+    for attempt in range(_MAX_RETRIES):
+        _throttle.wait()
+        try:
+            response = client.get_products(**params)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in _THROTTLE_CODES and attempt < _MAX_RETRIES - 1:
+                _throttle.throttled()
+                print(f"[AWS] WARN: {code} – Abstand jetzt {_throttle.interval:.2f}s (Versuch {attempt+1}/{_MAX_RETRIES})")
+                continue
+            raise
+        _throttle.success()
+        return response
+
+
+"""
+Holt eine get_products-Seite über den Seiten-Cache (Schlüssel sind die
+Parameter inkl. NextToken). Die Price List API kennt keine bedingten Requests.
+"""
+def _cached_products_page(params, refresh=False):
+    def loader(validators):
+        response = _get_products_page(params)
+        return {"PriceList": response["PriceList"], "NextToken": response.get("NextToken")}, None, None
+    return http_cache.fetch_with_source("aws", params, loader, refresh)
+
+
+"""
+Parst eine PriceList-Seite (JSON-Strings) und mappt sie in Preiszeilen.
+Läuft im Prozess-Pool; mapper muss daher eine Modul-Funktion sein (pickle).
+Mit missing_field werden nur Produkte ohne dieses Attribut übernommen
+(Rest-Durchlauf neben den Shards). Gibt (Zeilen, Werte von missing_field der
+übersprungenen Produkte) zurück.
+"""
+def _parse_page(price_list, mapper, missing_field=None):
+    rows = []
+    skipped = set()
+    for offer_json in price_list:
+        offer = _loads(offer_json)
+        value = (offer.get("product", {}).get("attributes") or {}).get(missing_field) if missing_field else None
+        if value:
+            skipped.add(value)
+            continue
+        rows.extend(mapper(offer))
+    return rows, skipped
 
+
+"""
+Gibt Parsen und Mappen einer Seite an den Prozess-Pool ab (bei
+AWS_PARSE_WORKERS=0 synchron) und liefert ein Future mit den Zeilen.
+"""
+def _submit_parse(price_list, mapper, missing_field=None):
+    global _parse_pool
+    if AWS_PARSE_WORKERS <= 0:
+        fut = Future()
+        fut.set_result(_parse_page(price_list, mapper, missing_field))
+        return fut
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=AWS_PARSE_WORKERS,
+                                              mp_context=multiprocessing.get_context(AWS_PARSE_START_METHOD))
+    return _parse_pool.submit(_parse_page, price_list, mapper, missing_field)
+
+
+"""
+Liefert alle Werte eines Attributs (z. B. location) für einen Service.
+"""
+def _attribute_values(service_code, field):
+    client = _pricing_client()
+    values = []
+    next_token = None
     while True:
-        params = {
-            "ServiceCode": "AmazonEC2",     
-            "FormatVersion": "aws_v1",
-            "MaxResults": 100,
-            "Filters": [
-                {"Type": "TERM_MATCH", "Field": "productFamily", "Value": "Storage"}
-            ]
-        }
+        params = {"ServiceCode": service_code, "AttributeName": field, "MaxResults": 100}
         if next_token:
             params["NextToken"] = next_token
-
-        response = client.get_products(**params)
-        time.sleep(0.1)
-
-        for offer_json in response["PriceList"]:
-            offer = json.loads(offer_json)
-            product = offer.get("product", {})
-            terms = offer.get("terms", {}).get("OnDemand", {})
-            attr = product.get("attributes", {}) or {}
-
-            for term in terms.values():
-                for price_detail in term.get("priceDimensions", {}).values():
-                    usd = price_detail.get("pricePerUnit", {}).get("USD")
-                    if not usd:
-                        continue
-                    prices.append({
-                        "provider": "AWS",
-                        "instance_type": attr.get("volumeType") or attr.get("usagetype") or "unknown",
-                        "service": product.get("productFamily") or "EBS",
-                        "sku": product.get("sku"),
-                        "resource_name": f"{attr.get('volumeType', 'EBS')} | {attr.get('usagetype', '')}".strip(),
-                        "region": attr.get("location", "unknown"),
-                        "price_per_unit": float(usd),
-                        "unit": price_detail.get("unit"), 
-                        "currency": "USD"
-                    })
-
+        _throttle.wait()
+        response = client.get_attribute_values(**params)
+        values.extend(v["Value"] for v in response.get("AttributeValues", []))
         next_token = response.get("NextToken")
         if not next_token:
             break
-
-    return prices
+    return values
 
 
 """
-Die Funktion holt alle Preise für Amazon RDS aus der AWS Price List API, 
-bereitet sie auf und gibt sie als Liste zurück.
+Blättert einen Seitenstrom von get_products durch und liefert je Seite die
+gemappten Preiszeilen. Ist ein NextToken aus einer zwischengespeicherten Seite
+oder aus einem Checkpoint abgelaufen, wird die Kette live neu gestartet;
+bereits gelieferte Seiten werden dabei übersprungen. Mit cp (ShardCheckpoint)
+folgt auf jede Seite eine Markierung mit dem nächsten NextToken.
+Geparst wird im Prozess-Pool, während bereits die nächste Seite geladen wird.
+missing_field und tally (_ShardTally) dienen dem Rest-Durchlauf und der
+Vollständigkeitsprüfung in _iter_sharded.
 """
-def get_aws_prices_rds():
-    client = boto3.client(
-        'pricing',
-        region_name='us-east-1',
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-    )
-
-    prices = []
-    next_token = None
+def _iter_stream(service_code, filters, mapper, cp=None, missing_field=None, tally=None):
+    if cp is not None and cp.done:
+        return
+    next_token = cp.start if cp is not None else None
+    refresh = False
+    prev_source = "checkpoint" if next_token else "live"
+    delivered = 0
+    skip = 0
+    pending = None
+
+    def collect(fut, token):
+        page, skipped = fut.result()
+        if tally is not None:
+            tally.add(skipped)
+        if cp is not None and token:
+            page.append(cp.marker(token, len(page)))
+        return page
 
     while True:
         params = {
-            "ServiceCode": "AmazonRDS",
+            "ServiceCode": service_code,
             "FormatVersion": "aws_v1",
             "MaxResults": 100,
-            "Filters": []
+            "Filters": filters
         }
         if next_token:
             params["NextToken"] = next_token
 
-        response = client.get_products(**params)
-        time.sleep(0.1)
-
-        for offer_json in response["PriceList"]:
-            offer = json.loads(offer_json)
-            product = offer.get("product", {})
-            terms = offer.get("terms", {}).get("OnDemand", {})
-            attr = product.get("attributes", {}) or {}
-            itype = attr.get("instanceType") or attr.get("databaseEdition") or attr.get("deploymentOption") or "unknown"
-            db_engine = attr.get("databaseEngine")
-            rname_bits = [itype]
-            if db_engine:
-                rname_bits.append(db_engine)
-            rname = " | ".join([b for b in rname_bits if b])
-
-            for term in terms.values():
-                for price_detail in term.get("priceDimensions", {}).values():
-                    price_per_unit = price_detail.get("pricePerUnit", {}).get("USD")
-                    if not price_per_unit:
-                        continue
-                    prices.append({
-                        "provider": "AWS",
-                        "instance_type": itype,
-                        "service": product.get("productFamily") or "RDS",
-                        "sku": product.get("sku"),
-                        "resource_name": rname or "RDS",
-                        "region": attr.get("location", "unknown"),
-                        "price_per_unit": float(price_per_unit),
-                        "unit": price_detail.get("unit"),
-                        "currency": "USD"
-                    })
+        try:
+            response, prev_source = _cached_products_page(params, refresh)
+        except ClientError:
+            if not next_token or prev_source == "live" or refresh:
+                raise
+            print(f"[AWS] NextToken ({prev_source}) ungültig – {service_code} wird live neu geladen")
+            refresh, next_token, skip = True, None, delivered
+            continue
 
         next_token = response.get("NextToken")
+        if skip:
+            skip -= 1
+        else:
+            fut = _submit_parse(response["PriceList"], mapper, missing_field)
+            delivered += 1
+            if pending is not None:
+                yield collect(*pending)
+            pending = (fut, next_token)
+
         if not next_token:
             break
 
-    return prices
+    if pending is not None:
+        yield collect(*pending)
+    if cp is not None:
+        yield [cp.finished()]
 
 
 """
-Wenn das Skript direkt gestartet wird, lädt es alle AWS-Preisdaten 
-(EC2, S3, EBS, RDS) und speichert sie gesammelt in der Datenbank.
+Merkt sich die Shard-Werte, die der Rest-Durchlauf bei übersprungenen
+Produkten gesehen hat. Jeder davon muss ein eigener Shard sein, sonst fehlen
+dessen Produkte.
 """
-if __name__ == "__main__":
-    aws_prices = get_aws_prices_ec2()          # EC2 
-    aws_prices += get_aws_prices_s3()          # S3
-    aws_prices += get_aws_prices_ebs()         # EBS
-    aws_prices += get_aws_prices_rds()         # RDS
+class _ShardTally:
 
-    print("Gefundene AWS-Preise:", len(aws_prices))
-    from db import insert_prices
-    insert_prices(aws_prices, "AWS")
+    def __init__(self, shard_values):
+        self._lock = threading.Lock()
+        self.shard_values = set(shard_values)
+        self.seen = set()
 
+    def add(self, values):
+        with self._lock:
+            self.seen |= values
 
+    def check(self, service_code):
+        missing = self.seen - self.shard_values
+        if missing:
+            raise RuntimeError(f"{service_code}: Werte ohne Shard {sorted(missing)[:5]} – Abruf unvollständig")
 
 
+"""
+Filter der Rest-Durchläufe: [(Wert, Filter)] je nicht-regionalem Wert des
+zweiten Attributs (leer, wenn es für den Service keins gibt).
+"""
+def _rest_partitions(service_code, filters, shard_field):
+    if shard_field not in _REST_PARTITIONS:
+        return []
+    field, regional = _REST_PARTITIONS[shard_field]
+    if any(f["Field"] == field for f in filters):
+        return []
+    try:
+        values = _attribute_values(service_code, field)
+    except ClientError as e:
+        print(f"[AWS] WARN: {service_code}: Attributwerte für {field} nicht abrufbar ({e}) – ohne Rest-Durchlauf")
+        return []
+    return [(v, filters + [{"Type": "TERM_MATCH", "Field": field, "Value": v}])
+            for v in values if v not in regional]
 
 
+"""
+Teilt einen Service nach AWS_SHARD_FIELD in unabhängige Seitenströme auf und
+ruft diese parallel im gemeinsamen, begrenzten Worker-Pool ab. Die Seiten
+werden über eine begrenzte Queue weitergereicht, sobald sie da sind.
+Produkte ohne das Shard-Attribut (z. B. globale S3-Transfer-SKUs) passen zu
+keinem Shard. Sie holt ein schmaler Rest-Durchlauf je nicht-regionalem Wert
+des Attributs aus _REST_PARTITIONS (z. B. locationType "Other"), nicht ein
+zweiter ungeteilter Abruf. Produkte ganz ohne beide Attribute werden nicht
+erfasst.
+"""
+def _iter_sharded(service_code, filters, mapper, shard_field=AWS_SHARD_FIELD, checkpoints=None):
+    shard_values = []
+    if shard_field and not any(f["Field"] == shard_field for f in filters):
+        try:
+            shard_values = _attribute_values(service_code, shard_field)
+        except ClientError as e:
+            print(f"[AWS] WARN: {service_code}: Attributwerte für {shard_field} nicht abrufbar ({e}) – ohne Sharding")
+
+    def shard(name):
+        return checkpoints.shard(name) if checkpoints is not None else None
+
+    if not shard_values:
+        yield from merge_streams([lambda: _iter_stream(service_code, filters, mapper, shard("*"))],
+                                 executor=_executor)
+        return
+
+    tally = _ShardTally(shard_values)
+    shards = [(v, filters + [{"Type": "TERM_MATCH", "Field": shard_field, "Value": v}]) for v in shard_values]
+    factories = [lambda name=name, f=f: _iter_stream(service_code, f, mapper, shard(name))
+                 for name, f in shards]
+    for value, f in _rest_partitions(service_code, filters, shard_field):
+        factories.append(lambda value=value, f=f: _iter_stream(service_code, f, mapper, shard(f"rest:{value}"),
+                                                                missing_field=shard_field, tally=tally))
+    yield from merge_streams(factories, executor=_executor)
+
+    if checkpoints is not None and (checkpoints.skipped or checkpoints.resumed):
+        print(f"[AWS] {service_code}: Vollständigkeitsprüfung übersprungen (fortgesetzter Lauf)")
+    else:
+        tally.check(service_code)
 
 
+"""
+Wählt die Quelle: Angebotsdateien (AWS_SOURCE=offers) oder die Price List API.
+Liefert die Preiszeilen als Strom (bei der API mit Checkpoint-Markierungen,
+wenn checkpoints übergeben wird; die lokalen Angebotsdateien brauchen keine).
+"""
+def _iter(service_code, filters, mapper, checkpoints=None):
+    if AWS_SOURCE == "offers":
+        return flatten(iter_from_offer_files(service_code, filters, mapper))
+    return flatten(_iter_sharded(service_code, filters, mapper, checkpoints=checkpoints))
 
 
+"""
+Mapper: wandeln ein Angebot der Price List API in Preiszeilen um.
+"""
+def _map_ec2_offer(offer):
+    rows = []
+    product = offer.get("product", {})
+    terms = offer.get("terms", {}).get("OnDemand", {})
+
+    for term in terms.values():
+        price_dimensions = term.get("priceDimensions", {})
+        for price_detail in price_dimensions.values():
+            price_per_unit = price_detail.get("pricePerUnit", {}).get("USD")
+            if price_per_unit:
+                attr = product.get("attributes", {})
+                rows.append({
+                    "provider": "AWS",
+                    "instance_type": attr.get("instanceType", "unknown"),
+                    "service": product.get("productFamily"),
+                    "sku": product.get("attributes", {}).get("instanceType") or product.get("sku"),
+                    "resource_name": f"{attr.get('instanceType', 'unknown')} | {attr.get('vcpu', '?')} vCPU | {attr.get('memory', '?')} RAM",
+                    "region": attr.get("location", "unknown"),
+                    "price_per_unit": float(price_per_unit),
+                    "unit": price_detail.get("unit"),
+                    "currency": "USD",
+                    "vcpu": attr.get("vcpu"),
+                    "memory": attr.get("memory"),
+                })
+    return rows
+
+
+def _map_s3_offer(offer):
+    rows = []
+    product = offer.get("product", {})
+    terms = offer.get("terms", {}).get("OnDemand", {})
+    attr = product.get("attributes", {}) or {}
+
+    for term in terms.values():
+        for price_detail in term.get("priceDimensions", {}).values():
+            price_per_unit = price_detail.get("pricePerUnit", {}).get("USD")
+            if not price_per_unit:
+                continue
+            rows.append({
+                "provider": "AWS",
+                "instance_type": attr.get("storageClass") or attr.get("usagetype") or "unknown",
+                "service": product.get("productFamily") or "S3",
+                "sku": product.get("sku"),
+                "resource_name": f"{attr.get('storageClass', 'S3')} | {attr.get('usagetype', '')}".strip(),
+                "region": attr.get("location", "unknown"),
+                "price_per_unit": float(price_per_unit),
+                "unit": price_detail.get("unit"),
+                "currency": "USD"
+            })
+    return rows
+
+
+def _map_ebs_offer(offer):
+    rows = []
+    product = offer.get("product", {})
+    terms = offer.get("terms", {}).get("OnDemand", {})
+    attr = product.get("attributes", {}) or {}
+
+    for term in terms.values():
+        for price_detail in term.get("priceDimensions", {}).values():
+            usd = price_detail.get("pricePerUnit", {}).get("USD")
+            if not usd:
+                continue
+            rows.append({
+                "provider": "AWS",
+                "instance_type": attr.get("volumeType") or attr.get("usagetype") or "unknown",
+                "service": product.get("productFamily") or "EBS",
+                "sku": product.get("sku"),
+                "resource_name": f"{attr.get('volumeType', 'EBS')} | {attr.get('usagetype', '')}".strip(),
+                "region": attr.get("location", "unknown"),
+                "price_per_unit": float(usd),
+                "unit": price_detail.get("unit"), 
+                "currency": "USD"
+            })
+    return rows
+
+
+def _map_rds_offer(offer):
+    rows = []
+    product = offer.get("product", {})
+    terms = offer.get("terms", {}).get("OnDemand", {})
+    attr = product.get("attributes", {}) or {}
+    itype = attr.get("instanceType") or attr.get("databaseEdition") or attr.get("deploymentOption") or "unknown"
+    db_engine = attr.get("databaseEngine")
+    rname_bits = [itype]
+    if db_engine:
+        rname_bits.append(db_engine)
+    rname = " | ".join([b for b in rname_bits if b])
+
+    for term in terms.values():
+        for price_detail in term.get("priceDimensions", {}).values():
+            price_per_unit = price_detail.get("pricePerUnit", {}).get("USD")
+            if not price_per_unit:
+                continue
+            rows.append({
+                "provider": "AWS",
+                "instance_type": itype,
+                "service": product.get("productFamily") or "RDS",
+                "sku": product.get("sku"),
+                "resource_name": rname or "RDS",
+                "region": attr.get("location", "unknown"),
+                "price_per_unit": float(price_per_unit),
+                "unit": price_detail.get("unit"),
+                "currency": "USD",
+                "vcpu": attr.get("vcpu"),
+                "memory": attr.get("memory"),
+            })
+    return rows
+
+
+"""
+Abfragen der vier Services (ServiceCode + Filter)
+"""
+EC2_FILTERS = [
+    {"Type": "TERM_MATCH", "Field": "operatingSystem", "Value": "Linux"},
+    {"Type": "TERM_MATCH", "Field": "tenancy", "Value": "Shared"},
+    {"Type": "TERM_MATCH", "Field": "preInstalledSw", "Value": "NA"}
+]
+EBS_FILTERS = [
+    {"Type": "TERM_MATCH", "Field": "productFamily", "Value": "Storage"}
+]
+
+
+"""
+Die Funktion holt alle Preise für Amazon EC2 aus der AWS Price List API, 
+bereitet sie auf und gibt sie als Liste zurück.
+"""
+def get_aws_prices_ec2():
+    return list(iter_aws_prices_ec2())
+
+
+def iter_aws_prices_ec2(checkpoints=None):
+    return _iter("AmazonEC2", EC2_FILTERS, _map_ec2_offer, checkpoints)
 
 
+"""
+Die Funktion holt alle Preise für Amazon S3 aus der AWS Price List API, 
+bereitet sie auf und gibt sie als Liste zurück.
+"""
+def get_aws_prices_s3():
+    return list(iter_aws_prices_s3())
+
+
+def iter_aws_prices_s3(checkpoints=None):
+    return _iter("AmazonS3", [], _map_s3_offer, checkpoints)
+
+
+"""
+Die Funktion holt alle Preise für Amazon EBS aus der AWS Price List API, 
+bereitet sie auf und gibt sie als Liste zurück.
+"""
+def get_aws_prices_ebs():
+    return list(iter_aws_prices_ebs())
+
+
+def iter_aws_prices_ebs(checkpoints=None):
+    return _iter("AmazonEC2", EBS_FILTERS, _map_ebs_offer, checkpoints)
+
+
+"""
+Die Funktion holt alle Preise für Amazon RDS aus der AWS Price List API, 
+bereitet sie auf und gibt sie als Liste zurück.
+"""
+def get_aws_prices_rds():
+    return list(iter_aws_prices_rds())
+
+
+def iter_aws_prices_rds(checkpoints=None):
+    return _iter("AmazonRDS", [], _map_rds_offer, checkpoints)
+
+
+"""
+Wenn das Skript direkt gestartet wird, lädt es alle AWS-Preisdaten 
+(EC2, S3, EBS, RDS) und speichert sie gesammelt in der Datenbank.
+"""
+if __name__ == "__main__":
+    aws_prices = get_aws_prices_ec2()          # EC2 
+    aws_prices += get_aws_prices_s3()          # S3
+    aws_prices += get_aws_prices_ebs()         # EBS
+    aws_prices += get_aws_prices_rds()         # RDS
+
+    print("Gefundene AWS-Preise:", len(aws_prices))
+    from db import insert_prices
+    insert_prices(aws_prices, "AWS")
@@ -0,0 +1,169 @@
+import os
+import csv
+import time
+from pathlib import Path
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+"""
+Bulk-Modus für AWS: statt get_products werden die Price-List-Angebotsdateien
+(regionale CSV-Dokumente) aus einem lokalen Verzeichnis gelesen.
+AWS_SOURCE=offers aktiviert den Modus, AWS_OFFER_DIR ist das Cache-Verzeichnis.
+"""
+AWS_SOURCE = os.getenv("AWS_SOURCE", "api").lower()
+AWS_OFFER_DIR = Path(os.getenv("AWS_OFFER_DIR", "cache/aws_offers"))
+AWS_OFFER_MAX_AGE_S = float(os.getenv("AWS_OFFER_MAX_AGE", str(24 * 3600)))
+AWS_OFFER_DOWNLOAD = os.getenv("AWS_OFFER_DOWNLOAD", "1") == "1"
+
+_OFFERS_BASE_URL = "https://pricing.us-east-1.amazonaws.com"
+_REGION_INDEX_URL = _OFFERS_BASE_URL + "/offers/v1.0/aws/{service}/current/region_index.json"
+
+"""
+CSV-Spalten → Attributnamen der Price List API (wie in product.attributes)
+"""
+_CSV_ATTRIBUTE_MAP = {
+    "Instance Type": "instanceType",
+    "vCPU": "vcpu",
+    "Memory": "memory",
+    "Location": "location",
+    "Operating System": "operatingSystem",
+    "Tenancy": "tenancy",
+    "Pre Installed S/W": "preInstalledSw",
+    "Database Engine": "databaseEngine",
+    "Database Edition": "databaseEdition",
+    "Deployment Option": "deploymentOption",
+    "Storage Class": "storageClass",
+    "usageType": "usagetype",
+    "Volume Type": "volumeType",
+    "Instance Family": "instanceFamily",
+    "Storage": "storage",
+}
+
+
+def _attribute_name(header):
+    if header in _CSV_ATTRIBUTE_MAP:
+        return _CSV_ATTRIBUTE_MAP[header]
+    words = header.replace("/", " ").replace("-", " ").split()
+    if not words:
+        return header
+    return words[0].lower() + "".join(w[:1].upper() + w[1:] for w in words[1:])
+
+
+def _is_fresh(path):
+    return path.exists() and time.time() - path.stat().st_mtime < AWS_OFFER_MAX_AGE_S
+
+
+"""
+Lädt eine Datei gestreamt auf die Festplatte (über eine .part-Datei).
+"""
+def _download(url, target):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(target.suffix + ".part")
+    with requests.get(url, stream=True, timeout=300) as r:
+        r.raise_for_status()
+        with tmp.open("wb") as f:
+            for block in r.iter_content(chunk_size=1 << 20):
+                f.write(block)
+    tmp.replace(target)
+
+
+"""
+Spiegelt die regionalen CSV-Angebotsdateien eines Services in AWS_OFFER_DIR
+(nur fehlende oder veraltete Dateien werden geladen).
+"""
+def download_offer_files(service_code, offer_dir=None):
+    service_dir = Path(offer_dir or AWS_OFFER_DIR) / service_code
+    index_url = _REGION_INDEX_URL.format(service=service_code)
+    r = requests.get(index_url, timeout=60)
+    r.raise_for_status()
+    regions = r.json().get("regions", {}) or {}
+
+    loaded = 0
+    for region, info in regions.items():
+        target = service_dir / f"{region}.csv"
+        if _is_fresh(target):
+            continue
+        url = _OFFERS_BASE_URL + info["currentVersionUrl"].replace(".json", ".csv")
+        print(f"[AWS] Angebotsdatei {service_code}/{region} laden …")
+        _download(url, target)
+        loaded += 1
+    return loaded
+
+
+"""
+Liest eine CSV-Angebotsdatei zeilenweise (konstanter Speicherbedarf) und liefert
+je OnDemand-Preisdimension ein Angebot im Format der get_products-Antwort.
+"""
+def iter_offer_file(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = None
+        for row in reader:
+            if row and row[0] == "SKU":
+                header = row
+                break
+        if header is None:
+            return
+
+        idx = {name: i for i, name in enumerate(header)}
+        attr_cols = [(i, _attribute_name(name)) for i, name in enumerate(header)]
+        i_term, i_price, i_cur = idx.get("TermType"), idx.get("PricePerUnit"), idx.get("Currency")
+        i_sku, i_unit, i_family = idx.get("SKU"), idx.get("Unit"), idx.get("Product Family")
+
+        for row in reader:
+            if len(row) != len(header) or row[i_term] != "OnDemand" or row[i_cur] != "USD":
+                continue
+            attributes = {key: row[i] for i, key in attr_cols if row[i]}
+            yield {
+                "product": {
+                    "sku": row[i_sku],
+                    "productFamily": row[i_family] if i_family is not None else None,
+                    "attributes": attributes,
+                },
+                "terms": {"OnDemand": {"csv": {"priceDimensions": {"csv": {
+                    "unit": row[i_unit],
+                    "pricePerUnit": {"USD": row[i_price]},
+                }}}}},
+            }
+
+
+"""
+Prüft ein Angebot gegen die TERM_MATCH-Filter der get_products-Abfrage.
+"""
+def _matches(offer, filters):
+    product = offer["product"]
+    attributes = product["attributes"]
+    for f in filters:
+        field, value = f["Field"], f["Value"]
+        actual = product.get("productFamily") if field == "productFamily" else attributes.get(field)
+        if (actual or "").lower() != value.lower():
+            return False
+    return True
+
+
+"""
+Liefert die Preiszeilen eines Services aus den lokalen Angebotsdateien, mit
+denselben Filtern und Mappern wie der API-Abruf (als Strom von Batches).
+"""
+def iter_from_offer_files(service_code, filters, mapper, offer_dir=None, batch_size=1000):
+    service_dir = Path(offer_dir or AWS_OFFER_DIR) / service_code
+    if AWS_OFFER_DOWNLOAD:
+        download_offer_files(service_code, offer_dir)
+
+    files = sorted(service_dir.glob("*.csv"))
+    if not files:
+        raise FileNotFoundError(f"Keine Angebotsdateien in {service_dir}")
+
+    batch = []
+    for path in files:
+        for offer in iter_offer_file(path):
+            if _matches(offer, filters):
+                batch.extend(mapper(offer))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
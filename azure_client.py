@@ -1,25 +1,80 @@
-import time, random, requests
+import os, time, random, threading, requests
+from requests.adapters import HTTPAdapter
+from service_catalog import is_azure_blob, is_azure_disk
+from pipeline import merge_streams, flatten
+from checkpoint import Marker
+import http_cache
 
 AZURE_PRICES_URL = "https://prices.azure.com/api/retail/prices"
 _DEFAULT_TIMEOUT = 180
 _MAX_RETRIES     = 4
 _BACKOFF_SECONDS = 2.0
-_MIN_INTERVAL_S  = 1.0    # min. Abstand zwischen Requests
 _JITTER_S        = 0.3    # kleiner Zufallsjitter
-_last_call_ts    = 0.0    # globales Throttle
-_storage_cache   = None   # Cache für "Storage & Consumption"
 
+AZURE_RATE_PER_S  = float(os.getenv("AZURE_RATE_PER_S", "2.0"))   # erlaubte Requests pro Sekunde (alle Threads)
+AZURE_BURST       = int(os.getenv("AZURE_BURST", "4"))
+AZURE_MAX_WORKERS = int(os.getenv("AZURE_MAX_WORKERS", "6"))      # parallele Seitenströme
 
 """
-Stellt sicher, dass zwischen Aufrufen eine Mindestpause liegt
+Partitionen für das Sharding (armRegionName). Items anderer oder leerer
+Regionen holt ein zusätzlicher Rest-Shard.
 """
-def _respect_min_interval():
-    global _last_call_ts
-    now = time.monotonic()
-    sleep_need = _MIN_INTERVAL_S - (now - _last_call_ts)
-    if sleep_need > 0:
-        time.sleep(sleep_need)
-    _last_call_ts = time.monotonic()
+AZURE_REGIONS = [
+    "australiacentral", "australiacentral2", "australiaeast", "australiasoutheast",
+    "austriaeast", "belgiumcentral", "brazilsouth", "brazilsoutheast",
+    "canadacentral", "canadaeast", "centralindia", "centralus", "chilecentral",
+    "eastasia", "eastus", "eastus2", "francecentral", "francesouth",
+    "germanynorth", "germanywestcentral", "indonesiacentral", "israelcentral",
+    "italynorth", "japaneast", "japanwest", "koreacentral", "koreasouth",
+    "malaysiawest", "mexicocentral", "newzealandnorth", "northcentralus",
+    "northeurope", "norwayeast", "norwaywest", "polandcentral", "qatarcentral",
+    "southafricanorth", "southafricawest", "southcentralus", "southindia",
+    "southeastasia", "spaincentral", "swedencentral", "swedensouth",
+    "switzerlandnorth", "switzerlandwest", "uaecentral", "uaenorth",
+    "uksouth", "ukwest", "westcentralus", "westeurope", "westindia",
+    "westus", "westus2", "westus3",
+]
+
+
+"""
+Token-Bucket, den sich alle Threads teilen: begrenzt die Request-Rate und
+pausiert global, wenn Azure per Retry-After zum Warten auffordert.
+"""
+class _TokenBucket:
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+_bucket = _TokenBucket(AZURE_RATE_PER_S, AZURE_BURST)
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=AZURE_MAX_WORKERS))
+_session.headers.update({"Accept": "application/json", "User-Agent": "cloudprice-prototype/1.0"})
 
 
 """
@@ -42,27 +97,32 @@ def _retry_after_seconds(resp):
 
 """
 Führt einen GET-Request aus, wiederholt bei Fehlern und wartet dazwischen.
+Client-Fehler (4xx außer 429, z. B. ein abgelehnter Filter) werden sofort
+als HTTPError weitergegeben – eine Wiederholung ändert an ihnen nichts.
 """
-def _get(url, params=None, timeout=_DEFAULT_TIMEOUT):
+def _get(url, params=None, timeout=_DEFAULT_TIMEOUT, headers=None):
     attempt = 0
     last_exc = None
-    headers = {"Accept": "application/json", "User-Agent": "cloudprice-prototype/1.0"}
     while attempt < _MAX_RETRIES:
         try:
-            _respect_min_interval()
-            resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+            _bucket.acquire()
+            resp = _session.get(url, params=params, timeout=timeout, headers=headers)
             if resp.status_code == 429 or resp.status_code >= 500:
                 ra = _retry_after_seconds(resp)
                 if ra is None:
                     ra = _BACKOFF_SECONDS * (2 ** attempt)
                 ra += random.uniform(0, _JITTER_S)
                 print(f"[Azure] WARN: {resp.status_code} – warte {ra:.1f}s (Versuch {attempt+1}/{_MAX_RETRIES}) …")
+                if resp.status_code == 429:
+                    _bucket.pause(ra)   # alle Shards warten
                 time.sleep(ra)
                 attempt += 1
                 continue
             resp.raise_for_status()
             return resp
         except requests.RequestException as e:
+            if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500:
+                raise
             last_exc = e
             ra = _BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, _JITTER_S)
             print(f"[Azure] WARN: Request fehlgeschlagen (Versuch {attempt+1}/{_MAX_RETRIES}): {e}. Backoff {ra:.1f}s …")
@@ -72,30 +132,99 @@ def _get(url, params=None, timeout=_DEFAULT_TIMEOUT):
 
 
 """
-Holt alle Seiten via NextPageLink (kein $skip manuell).
+Holt eine JSON-Seite über den Seiten-Cache (http_cache); abgelaufene Einträge
+werden per ETag/Last-Modified revalidiert, sofern die API diese liefert.
 """
-def _azure_fetch(filter_expr: str):
-    results = []
-    next_page = AZURE_PRICES_URL
+def _get_json(url, params=None):
+    def loader(validators):
+        resp = _get(url, params=params, headers=validators or None)
+        if resp.status_code == 304:
+            return None
+        return resp.json(), resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    return http_cache.fetch("azure", {"url": url, "params": params}, loader)
+
+
+"""
+Holt alle Seiten via NextPageLink (kein $skip manuell) und liefert sie einzeln.
+Mit cp (ShardCheckpoint) beginnt der Abruf beim gespeicherten NextPageLink und
+jede Seite endet mit einer Markierung für den nächsten Link.
+"""
+def _iter_azure_pages(filter_expr: str, cp=None):
+    if cp is not None and cp.done:
+        return
+    next_page = (cp.start if cp is not None else None) or AZURE_PRICES_URL
     params = {"$filter": filter_expr}
     while next_page:
-        resp = _get(next_page, params=params if next_page == AZURE_PRICES_URL else None)
-        data = resp.json()
+        data = _get_json(next_page, params=params if next_page == AZURE_PRICES_URL else None)
         items = data.get("Items", []) or []
-        results.extend(items)
         next_page = data.get("NextPageLink")
-    return results
+        if cp is not None:
+            items = items + [cp.marker(next_page, len(items)) if next_page else cp.finished()]
+        yield items
+
+
+"""
+Holt alle Seiten und gibt die Items als Liste zurück.
+"""
+def _azure_fetch(filter_expr: str):
+    return list(flatten(_iter_azure_pages(filter_expr)))
+
+
+"""
+Rest-Shard: alle Items, deren armRegionName nicht in AZURE_REGIONS liegt
+(auch globale Items mit leerer Region). Die sortierten Regionen werden in
+Abschnitte zu AZURE_REST_CHUNK geteilt; je Abschnitt deckt ein Filter den
+Bereich zwischen dessen Grenzregionen ab (gt/lt) und schließt die Regionen
+darin per 'ne' aus. Die Filter überschneiden sich nicht, decken zusammen
+genau den Rest ab und bleiben kurz – kein Item eines Regions-Shards wird
+doppelt geladen.
+"""
+AZURE_REST_CHUNK = int(os.getenv("AZURE_REST_CHUNK", "12"))
+
+
+def _rest_filters(filter_expr: str, chunk=AZURE_REST_CHUNK):
+    regions = sorted(set(AZURE_REGIONS))
+    step = max(1, chunk)
+    bounds = [None] + regions[step::step] + [None]
+    filters = []
+    for low, high in zip(bounds, bounds[1:]):
+        inside = [r for r in regions if (low is None or r > low) and (high is None or r < high)]
+        parts = [filter_expr]
+        if low is not None:
+            parts.append(f"armRegionName gt '{low}'")
+        if high is not None:
+            parts.append(f"armRegionName lt '{high}'")
+        parts += [f"armRegionName ne '{r}'" for r in inside]
+        filters.append(" and ".join(parts))
+    return filters
+
+
+"""
+Holt eine Abfrage parallel, aufgeteilt nach armRegionName, und liefert die
+Seiten über eine begrenzte Queue, sobald sie ankommen. Alle Shards teilen
+sich Session und Token-Bucket, die Wiederholungslogik von _get bleibt gleich.
+Mit checkpoints (ServiceCheckpoints) ist jede Region ein eigener Shard.
+"""
+def _iter_azure_sharded(filter_expr: str, checkpoints=None):
+    def shard(name):
+        return checkpoints.shard(name) if checkpoints is not None else None
+    factories = [lambda r=r: _iter_azure_pages(f"{filter_expr} and armRegionName eq '{r}'", shard(r))
+                 for r in AZURE_REGIONS]
+    factories += [lambda i=i, f=f: _iter_azure_pages(f, shard(f"rest:{i}"))
+                  for i, f in enumerate(_rest_filters(filter_expr))]
+    yield from merge_streams(factories, max_workers=AZURE_MAX_WORKERS)
 
 
 """
 Normalisierung der Preisdaten
 """
-def _map_items(items):
-    mapped = []
+def _iter_mapped(items):
     for item in items:
-        if (item.get("retailPrice") or 0) > 0:
+        if isinstance(item, Marker):
+            yield item
+        elif (item.get("retailPrice") or 0) > 0:
             arm = item.get("armSkuName")
-            mapped.append({
+            yield {
                 "provider": "Azure",
                 "instance_type": arm or item.get("skuName", "unknown"),
                 "service": item.get("serviceName"),
@@ -105,8 +234,7 @@ def _map_items(items):
                 "price_per_unit": item.get("retailPrice"),
                 "unit": item.get("unitOfMeasure"),
                 "currency": item.get("currencyCode"),
-            })
-    return mapped
+            }
 
 
 """
@@ -114,54 +242,36 @@ Die Funktion holt alle Preise für Microsoft Azure Virtual Machines aus der Azur
 und gibt sie im vereinheitlichten Format zurück.
 """
 def get_azure_vm_prices():
-    items = _azure_fetch("serviceName eq 'Virtual Machines' and type eq 'Consumption'")
-    return _map_items(items)
+    return list(iter_azure_vm_prices())
 
 
-"""
-Storage (einmal holen & cachen)
-"""
-def _get_storage_consumption_items():
-    global _storage_cache
-    if _storage_cache is None:
-        _storage_cache = _azure_fetch("serviceName eq 'Storage' and type eq 'Consumption'")
-    return _storage_cache
+def iter_azure_vm_prices(checkpoints=None):
+    return _iter_mapped(flatten(_iter_azure_sharded("serviceName eq 'Virtual Machines' and type eq 'Consumption'",
+                                                    checkpoints)))
 
 
 """
-Die Funktion holt alle Preise für Microsoft Azure Blob Prices aus der Azure Retail API, 
+Die Funktion holt alle Preise für Microsoft Azure SQL Database aus der Azure Retail API, 
 und gibt sie im vereinheitlichten Format zurück.
 """
-def get_azure_blob_prices():
-    items = _get_storage_consumption_items()
-    filtered = []
-    for it in items:
-        pn = (it.get("productName") or "")
-        sn = (it.get("skuName") or "")
-        if ("blob" in pn.lower()) or ("blob" in sn.lower()):
-            filtered.append(it)
-    return _map_items(filtered)
+def get_azure_sql_prices():
+    return list(iter_azure_sql_prices())
 
 
-"""
-Die Funktion holt alle Preise für Microsoft Azure Disk Storage aus der Azure Retail API, 
-und gibt sie im vereinheitlichten Format zurück.
-"""
-def get_azure_disk_prices():
-    items = _get_storage_consumption_items()
-    keys = ["disk", "managed disk", "premium ssd", "standard ssd", "standard hdd", "ultra disk"]
-    filtered = []
-    for it in items:
-        text = f"{it.get('productName') or ''} {it.get('skuName') or ''}".lower()
-        if any(k in text for k in keys):
-            filtered.append(it)
-    return _map_items(filtered)
+def iter_azure_sql_prices(checkpoints=None):
+    return _iter_mapped(flatten(_iter_azure_sharded("serviceName eq 'SQL Database' and type eq 'Consumption'",
+                                                    checkpoints)))
 
 
 """
-Die Funktion holt alle Preise für Microsoft Azure SQL Database aus der Azure Retail API, 
-und gibt sie im vereinheitlichten Format zurück.
+Liefert Blob- und Disk-Preise als Strom aus einem einzigen Storage-Abruf
+(ohne Zwischenspeicher: jede Seite wird direkt aufgeteilt und gemappt).
 """
-def get_azure_sql_prices():
-    items = _azure_fetch("serviceName eq 'SQL Database' and type eq 'Consumption'")
-    return _map_items(items)
+def iter_azure_storage_prices(checkpoints=None):
+    for page in _iter_azure_sharded("serviceName eq 'Storage' and type eq 'Consumption'", checkpoints):
+        wanted = [it for it in page
+                  if isinstance(it, Marker)
+                  or is_azure_blob(it.get("productName"), it.get("skuName"))
+                  or is_azure_disk(it.get("productName"), it.get("skuName"))]
+        yield from _iter_mapped(wanted)
+
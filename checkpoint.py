@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+"""
+Checkpoints für fortsetzbare Aktualisierungen: pro Anbieter, Service und Shard
+wird die nächste Seitenposition (NextToken bzw. NextPageLink) und die Anzahl
+geschriebener Zeilen gespeichert. Ältere Stände als CHECKPOINT_MAX_AGE werden
+verworfen, REFRESH_RESUME=0 startet immer neu.
+"""
+CHECKPOINT_FILE = Path(os.getenv("CHECKPOINT_FILE", "cache/checkpoints.json"))
+CHECKPOINT_MAX_AGE_S = float(os.getenv("CHECKPOINT_MAX_AGE", str(6 * 3600)))
+REFRESH_RESUME = os.getenv("REFRESH_RESUME", "1") == "1"
+
+
+"""
+Markierung im Zeilenstrom: alle Zeilen davor gehören zur Position 'position'.
+Der Writer speichert sie erst, wenn diese Zeilen committet sind.
+"""
+class Marker:
+    __slots__ = ("provider", "service", "shard", "position", "rows", "done")
+
+    def __init__(self, provider, service, shard, position, rows, done=False):
+        self.provider = provider
+        self.service = service
+        self.shard = shard
+        self.position = position
+        self.rows = rows
+        self.done = done
+
+
+"""
+Stand eines einzelnen Seitenstroms (Shard) eines Services.
+"""
+class ShardCheckpoint:
+
+    def __init__(self, service, shard, saved):
+        self.service = service
+        self.shard = shard
+        self.start = saved.get("next")
+        self.done = bool(saved.get("done"))
+        self.rows = int(saved.get("rows", 0))
+
+    def marker(self, position, page_rows):
+        self.rows += page_rows
+        return Marker(self.service.provider, self.service.name, self.shard, position, self.rows)
+
+    def finished(self):
+        return Marker(self.service.provider, self.service.name, self.shard, None, self.rows, done=True)
+
+
+"""
+Checkpoints eines Services; zählt, welche Shards übersprungen bzw. fortgesetzt wurden.
+"""
+class ServiceCheckpoints:
+
+    def __init__(self, provider, name, saved):
+        self.provider = provider
+        self.name = name
+        self._saved = saved
+        self._lock = threading.Lock()
+        self.skipped = 0
+        self.resumed = 0
+
+    def shard(self, name):
+        cp = ShardCheckpoint(self, str(name), self._saved.get(str(name), {}))
+        with self._lock:
+            if cp.done:
+                self.skipped += 1
+            elif cp.start:
+                self.resumed += 1
+        return cp
+
+    def describe(self):
+        if not self.skipped and not self.resumed:
+            return "neu abgerufen"
+        return f"fortgesetzt: {self.skipped} Shards fertig übernommen, {self.resumed} ab gespeicherter Position"
+
+
+"""
+JSON-Datei mit den Checkpoints aller Anbieter (atomar geschrieben).
+"""
+class CheckpointStore:
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self._state = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._state = {}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".part")
+        tmp.write_text(json.dumps(self._state, indent=1), encoding="utf-8")
+        tmp.replace(self.path)
+
+    """
+    Beginnt den Lauf eines Anbieters. Gibt True zurück, wenn ein gespeicherter
+    Stand fortgesetzt wird; sonst wird der Stand des Anbieters zurückgesetzt.
+    """
+    def begin(self, provider, resume=REFRESH_RESUME):
+        with self._lock:
+            state = self._state.get(provider)
+            fresh = state is not None and time.time() - state.get("started", 0) < CHECKPOINT_MAX_AGE_S
+            if resume and fresh and state.get("services"):
+                return True
+            self._state[provider] = {"started": time.time(), "services": {}}
+            self._save()
+            return False
+
+    def service(self, provider, name):
+        with self._lock:
+            saved = self._state.get(provider, {}).get("services", {}).get(name, {})
+        return ServiceCheckpoints(provider, name, dict(saved))
+
+    """
+    Übernimmt Markierungen, deren Zeilen committet sind, und speichert die Datei.
+    """
+    def commit(self, markers):
+        if not markers:
+            return
+        with self._lock:
+            for m in markers:
+                provider = self._state.setdefault(m.provider, {"started": time.time(), "services": {}})
+                shards = provider["services"].setdefault(m.service, {})
+                shards[m.shard] = {"next": m.position, "rows": m.rows, "done": m.done}
+            self._save()
+
+    """
+    Schließt den Lauf eines Anbieters ab (alle Services vollständig).
+    """
+    def finish(self, provider):
+        with self._lock:
+            self._state.pop(provider, None)
+            self._save()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def checkpoint_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CheckpointStore()
+        return _store
@@ -3,6 +3,18 @@ from mysql.connector import Error
 from dotenv import load_dotenv
 import os
 import time
+import json
+import base64
+import threading
+from collections import OrderedDict
+from update_timestamp import data_stamp
+from units import normalize_batch, batch_to_rows
+from db_pool import pooled_connection
+from search import build_filter_clause
+from service_catalog import classify_service
+from resource_attributes import parse_attributes
+from delta import row_hash
+from checkpoint import Marker
 
 load_dotenv()
 
@@ -15,22 +27,16 @@ user = os.getenv("DB_USER")
 Holt alle verschiedenen Regionen aus der Datenbank
 """
 def get_all_regions():
-    connection = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
-    cursor = connection.cursor()
-    cursor.execute("""
-        SELECT DISTINCT region
-        FROM cloud_prices
-        WHERE region IS NOT NULL AND region <> ''
-        ORDER BY region
-    """)
-    regions = [r[0] for r in cursor.fetchall()]
-    cursor.close()
-    connection.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT DISTINCT region
+            FROM cloud_prices
+            WHERE region IS NOT NULL AND region <> ''
+            ORDER BY region
+        """)
+        regions = [r[0] for r in cursor.fetchall()]
+        cursor.close()
     return regions
 
 
@@ -53,137 +59,171 @@ def create_connection():
         return None
 
     
+"""
+Einstellungen für den Bulk-Import: Zeilen pro Multi-Row-INSERT und
+nach wie vielen Chunks ein Commit erfolgt.
+"""
+INSERT_CHUNK_SIZE = int(os.getenv("DB_INSERT_CHUNK_SIZE", "5000"))
+COMMIT_EVERY_CHUNKS = int(os.getenv("DB_COMMIT_EVERY_CHUNKS", "4"))
+
+"""
+Tabelle, in die insert_prices standardmäßig schreibt
+"""
+PRICES_TABLE = "cloud_prices"
+
+_UPSERT_SQL = """
+    INSERT INTO {table}
+    (provider, instance_type, service, sku, resource_name, region, price_per_unit, unit, currency,
+     canonical_service, family, vcpu, memory_gib, storage_class, row_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        instance_type = VALUES(instance_type),
+        resource_name = VALUES(resource_name),
+        price_per_unit = VALUES(price_per_unit),
+        unit = VALUES(unit),
+        currency = VALUES(currency),
+        canonical_service = VALUES(canonical_service),
+        family = VALUES(family),
+        vcpu = VALUES(vcpu),
+        memory_gib = VALUES(memory_gib),
+        storage_class = VALUES(storage_class),
+        row_hash = VALUES(row_hash)
+"""
+
+
+"""
+Schreibt einen Chunk per Multi-Row-INSERT (executemany bündelt die Zeilen
+zu einem einzigen INSERT ... VALUES (...), (...) ON DUPLICATE KEY UPDATE).
+"""
+def _write_chunk(cursor, rows, table=PRICES_TABLE):
+    if not rows:
+        return 0
+    cursor.executemany(_UPSERT_SQL.format(table=table), rows)
+    return len(rows)
+
+
 """ 
 Speichert Preisdaten in der Datenbank-Tabelle 'cloud_prices'.
+Die Zeilen werden in Chunks (chunk_size) geschrieben und alle
+commit_every Chunks committet. Gibt die Anzahl geschriebener Zeilen zurück.
+Mit delta (delta.HashIndex) werden nur neue und geänderte Zeilen geschrieben,
+mit table z. B. in die Schattentabelle statt in 'cloud_prices'.
+Checkpoint-Markierungen (checkpoint.Marker) im Strom werden nach dem Commit
+der vorangehenden Zeilen an checkpoints (CheckpointStore) übergeben.
 """
-def insert_prices(prices,provider):
-    connection = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
+def insert_prices(prices, provider, chunk_size=None, commit_every=None, delta=None, table=PRICES_TABLE,
+                  checkpoints=None):
+    chunk_size = max(1, int(chunk_size or INSERT_CHUNK_SIZE))
+    commit_every = max(1, int(commit_every or COMMIT_EVERY_CHUNKS))
+
+    with pooled_connection() as connection:
+        return _insert_chunks(connection, prices, provider, chunk_size, commit_every, delta, table,
+                              checkpoints)
+
+
+"""
+Schreibt die Preise chunkweise über die übergebene Verbindung.
+"""
+def _insert_chunks(connection, prices, provider, chunk_size, commit_every, delta=None, table=PRICES_TABLE,
+                   checkpoints=None):
     cursor = connection.cursor()
 
-    for entry in prices:
-
-        UNIT_KEY_MAP = {
-            "h": "hour", "hr": "hour", "hrs": "hour", "hour": "hour",
-            "s": "seconds", "sec": "seconds", "secs": "seconds", "second": "seconds", "seconds": "seconds",
-            "mo": "mo", "mon": "mo", "month": "mo", "months": "mo",
-            "giby.mo": "giby.mo", "gb-month": "giby.mo",
-            "giby":    "giby.mo",
-            "giby.h":  "giby.h",
-            "gby.h": "gby.h",
-            "1 hour":  "hour",
-            "mbps": "mbps",
-            "gb-month": "giby.mo", "gb/mo": "giby.mo", "gb per month": "giby.mo",
-            "gib.mo": "giby.mo", "gib-month": "giby.mo", "gibibyte month": "giby.mo",
-            "request": "request", "requests": "request",
-            "1k requests": "1kreq", "1000 requests": "1kreq",
-            "1m requests": "1mreq", "million requests": "1mreq",
-            "min": "minutes", "minute": "minutes", "minutes": "minutes"
-        }
-
-        UNIT_MAP = {
-            "hour": "$/Stunde",
-            "mo":   "$/Monat",
-            "giby.mo": "$/GB/Monat",
-            "gb-mo": "$/GB/Monat",
-            "1/day": "$/Tag",
-            "giby.h":   "$/GB/Stunde",
-            "gby.h":   "$/GB/Stunde",
-            "giby":      "$/GB/Monat",
-            "gb":      "$/GB/Monat",
-            "mbps": "$/MB/s",
-            "seconds": "$/Sekunde",
-            "request": "$/Request",
-            "1kreq": "$/1k Requests",
-            "1mreq": "$/1M Requests",
-            "minutes": "$/Minute",
-            "vcpu-hour": "$/vCPU/Stunde",
-            "vcpu-months": "$/vCPU/Monat",
-            "vcpu-hours": "$/vCPU/Stunde",
-            "iops-mo": "$/IOPS/Monat"
-        }
-
-        # Sekunden-Rate in Stunden-Rate umrechnen 
-        if entry["unit"].lower() == "seconds":
-            entry["price_per_unit"] = float(entry["price_per_unit"]) * 3600
-            entry["unit"] = "hour"
-
-        # Normalisieren
-        raw = entry["unit"].lower()
-        key = UNIT_KEY_MAP.get(raw, raw)
-
-        # Mappen
-        entry["unit"] = UNIT_MAP.get(key, entry["unit"])
-
-        # Preise ≤ 0 überspringen
-        if float(entry["price_per_unit"]) <= 0.0:
-            continue
+    total = 0
+    chunk_no = 0
+    chunk = []
+    received_markers = []
+    written_markers = []
+
+    def commit():
+        connection.commit()
+        if checkpoints is not None:
+            checkpoints.commit(written_markers)
+        written_markers.clear()
+
+    def flush():
+        nonlocal total, chunk_no, chunk
+        if not chunk:
+            return
+        t0 = time.time()
+        for entry in chunk:
+            entry["canonical_service"] = classify_service(provider, entry)
+            entry.update(parse_attributes(provider, entry))
+        rows = [row + (row_hash(row),) for row in batch_to_rows(normalize_batch(chunk), provider)]
+        received = len(rows)
+        if delta is not None:
+            rows = delta.filter(rows)
+        written = _write_chunk(cursor, rows, table)
+        chunk_no += 1
+        total += written
+        written_markers.extend(received_markers)
+        received_markers.clear()
+        if chunk_no % commit_every == 0:
+            commit()
+        print(f"{provider}: Chunk {chunk_no}: {written}/{received} Zeilen geschrieben ({time.time() - t0:.2f}s)")
+        chunk = []
+
+    try:
+        for entry in prices:
+            if isinstance(entry, Marker):
+                received_markers.append(entry)
+                continue
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+        written_markers.extend(received_markers)
+        commit()
+    finally:
+        cursor.close()
+
+    return total
 
-        cursor.execute("""
-            INSERT INTO cloud_prices
-            (provider, instance_type, service, sku, resource_name, region, price_per_unit, unit, currency)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                instance_type = VALUES(instance_type),
-                resource_name = VALUES(resource_name),
-                price_per_unit = VALUES(price_per_unit),
-                unit = VALUES(unit),
-                currency = VALUES(currency)
-        """, (
-            provider,
-            entry.get('instance_type'),
-            entry['service'],
-            entry['sku'],
-            entry.get('resource_name'),
-            entry['region'],
-            entry['price_per_unit'],
-            entry['unit'],
-            entry['currency']
-        ))
-
-    connection.commit()
-    cursor.close()
-    connection.close()
+
+"""
+Löscht Einträge anhand ihrer IDs (in Blöcken, z. B. verschwundene Preise im Delta-Modus).
+"""
+def delete_prices_by_id(ids, chunk_size=None):
+    chunk_size = max(1, int(chunk_size or INSERT_CHUNK_SIZE))
+    deleted = 0
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        for i in range(0, len(ids), chunk_size):
+            block = ids[i:i + chunk_size]
+            placeholders = ", ".join(["%s"] * len(block))
+            cursor.execute(f"DELETE FROM cloud_prices WHERE id IN ({placeholders})", tuple(block))
+            deleted += cursor.rowcount
+        connection.commit()
+        cursor.close()
+    return deleted
 
 
 """
 Löscht die alten Einträge aus der Datenbank
 """
 def delete_provider_prices(provider):
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute("DELETE FROM cloud_prices WHERE provider = %s", (provider,))
-    connection.commit()
-    cursor.close()
-    connection.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM cloud_prices WHERE provider = %s", (provider,))
+        connection.commit()
+        cursor.close()
 
 
 """ 
 Liest Preiseinträge aus der Datenbank, sortiert nach Preis.
 """
 def select_all_prices(limit=10):
-    connection = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
-    cursor = connection.cursor(dictionary=True)
-
-    cursor.execute("""
-        SELECT provider, instance_type, sku, region, price_per_unit, currency
-        FROM cloud_prices
-        ORDER BY price_per_unit ASC
-        LIMIT %s
-    """, (limit,))
-
-    rows = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+
+        cursor.execute("""
+            SELECT provider, instance_type, sku, region, price_per_unit, currency
+            FROM cloud_prices
+            ORDER BY price_per_unit ASC
+            LIMIT %s
+        """, (limit,))
+
+        rows = cursor.fetchall()
+        cursor.close()
     return rows
 
 
@@ -202,20 +242,15 @@ def get_all_prices():
     if _cached_prices is not None and now - _last_cache_time < _CACHE_TTL_SECONDS:
         return _cached_prices
 
-    conn = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME")
-    )
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT * FROM cloud_prices
-        WHERE region LIKE '%Europe%' OR region LIKE '%EU%'
-        ORDER BY provider
-    """)
-    result = cursor.fetchall() 
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT * FROM cloud_prices
+            WHERE region LIKE '%Europe%' OR region LIKE '%EU%'
+            ORDER BY provider
+        """)
+        result = cursor.fetchall() 
+        cursor.close()
 
     _cached_prices = result
     _last_cache_time = now
@@ -243,167 +278,328 @@ def remove_duplicates(prices):
     return unique_prices
 
 
-""" 
-Filtert die Preise nach bestimmten Kriterien (Provider, Service usw.) und sortiert die Ergebnisse.
 """
-def get_filtered_prices(filters, sort_by=None, order='asc'):
-    allowed_sort_fields = ['provider', 'instance_type', 'service', 'sku', 'resource_name', 'region', 'price_per_unit']
-    if sort_by not in allowed_sort_fields:
+Erlaubte Sortierfelder. Sortiert wird immer zusätzlich nach id als eindeutigem
+Tiebreaker, damit die Keyset-Pagination stabil ist. Jede Sortierung hat einen
+passenden Index (schema.INDEXES, Spalte(n) + id); instance_type, resource_name
+und region werden dafür als '' statt NULL gespeichert.
+"""
+ALLOWED_SORT_FIELDS = ['provider', 'instance_type', 'service', 'sku', 'resource_name', 'region', 'price_per_unit']
+_NULLABLE_SORT_FIELDS = {'instance_type', 'resource_name', 'region'}
+
+
+def _normalize_sort(sort_by, order):
+    if sort_by not in ALLOWED_SORT_FIELDS:
         sort_by = 'provider'
     if order not in ['asc', 'desc']:
         order = 'asc'
+    return sort_by, order
 
-    defaults = {
-        "provider": "", "q": "", "service": "", "sku": "",
-        "resource_name": "", "resource": "", "instance_type": "", "region": ""
-    }
-    filters = {**defaults, **(filters or {})}
 
-    connection = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
-    cursor = connection.cursor(dictionary=True)
+def _sort_columns(sort_by):
+    cols = ['provider', 'sku'] if sort_by == 'provider' else [sort_by]
+    return cols + ['id']
 
-    query = "SELECT * FROM cloud_prices WHERE 1=1"
 
-    params = []
+""" 
+Filtert die Preise nach bestimmten Kriterien (Provider, Service usw.) und sortiert die Ergebnisse.
+"""
+def get_filtered_prices(filters, sort_by=None, order='asc'):
+    sort_by, order = _normalize_sort(sort_by, order)
+    where, params = build_filter_clause(filters)
+    query = f"SELECT * FROM cloud_prices WHERE {where}"
 
-    if filters.get("q"):
-        qv = f"%{filters['q']}%"
-        query += " AND (provider LIKE %s OR sku LIKE %s OR resource_name LIKE %s)"
-        params.extend([qv, qv, qv])
-
-    if filters["provider"]:
-        query += " AND provider LIKE %s"
-        params.append(f"%{filters['provider']}%")
-
-    if filters.get("instance_type"):
-        query += " AND instance_type LIKE %s"
-        params.append(f"%{filters['instance_type']}%")
-
-    service  = (filters.get("service") or "").strip()
-    provider = (filters.get("provider") or "").strip()
-
-    if service:
-        s = service.lower()
-
-        if provider == "AWS":
-            if s == "ec2":
-                query += (" AND provider='AWS' AND ("
-                        " service LIKE 'Compute%%'"
-                        " OR resource_name LIKE '%%EC2%%'"
-                        " OR instance_type REGEXP '^[a-z0-9]+(\\.[a-z0-9]+)?$'"
-                        ")")
-            elif s == "s3":
-                query += (" AND provider='AWS' AND ("
-                        " (service='Storage' OR service LIKE 'S3%%')"
-                        " AND (resource_name LIKE '%%S3%%' OR instance_type LIKE '%%S3%%')"
-                        ")")
-            elif s == "ebs":
-                query += (" AND provider='AWS' AND ("
-                        " (service='Storage' OR service LIKE 'EBS%%')"
-                        " AND (resource_name LIKE '%%EBS%%' OR instance_type LIKE '%%EBS%%' OR sku LIKE '%%EBS%%')"
-                        ")")
-            elif s == "rds":
-                query += (" AND provider='AWS' AND ("
-                        " service LIKE 'Database%%'"
-                        " OR resource_name LIKE '%%RDS%%'"
-                        " OR resource_name LIKE '%%RDS Proxy%%'"
-                        " OR instance_type LIKE 'db.%%'"
-                        ")")
-            else:
-                query += " AND service LIKE %s"
-                params.append(f"%{service}%")
-
-        elif provider == "Azure":
-            if s == "virtual machines":
-                query += " AND provider='Azure' AND service='Virtual Machines'"
-            elif s == "sql database":
-                query += " AND provider='Azure' AND service='SQL Database'"
-            elif s in ("cloud storage", "blob storage"):
-                query += (" AND provider='Azure' AND service='Storage' AND ("
-                        " LOWER(resource_name) LIKE %s OR LOWER(sku) LIKE %s OR LOWER(instance_type) LIKE %s)")
-                like = "%blob%"
-                params.extend([like, like, like])
-            elif s == "disk storage":
-                disk_keys = ["disk", "managed disk", "premium ssd", "standard ssd", "standard hdd", "ultra disk"]
-                or_parts = []
-                for _ in disk_keys:
-                    or_parts += ["LOWER(resource_name) LIKE %s", "LOWER(sku) LIKE %s", "LOWER(instance_type) LIKE %s"]
-                query += " AND provider='Azure' AND service='Storage' AND (" + " OR ".join(or_parts) + ")"
-                for k in disk_keys:
-                    lk = f"%{k}%"
-                    params.extend([lk, lk, lk])
-            else:
-                query += " AND service LIKE %s"
-                params.append(f"%{service}%")
-
-        elif provider == "GCP":
-            if s == "compute engine":
-                query += " AND provider='GCP' AND service LIKE 'Compute Engine%%'"
-            elif s == "cloud storage":
-                query += " AND provider='GCP' AND service LIKE 'Cloud Storage%%'"
-            elif s == "persistent disk":
-                query += " AND provider='GCP' AND service LIKE 'Persistent Disk%%'"
-            elif s == "cloud sql":
-                query += " AND provider='GCP' AND service LIKE 'Cloud SQL%%'"
-            else:
-                query += " AND service LIKE %s"
-                params.append(f"%{service}%")
+    if sort_by == 'provider':
+        query += f" ORDER BY provider {order.upper()}, sku {order.upper()} LIMIT 3000"
+    else:
+        query += f" ORDER BY {sort_by} {order.upper()} LIMIT 3000"
 
-        else:
-            
-            query += " AND service LIKE %s"
-            params.append(f"%{service}%")
 
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        result = cursor.fetchall()
+        cursor.close()
+    return result
 
 
-    if filters["sku"]:
-        query += " AND sku LIKE %s"
-        params.append(f"%{filters['sku']}%")
+"""
+Kodiert/dekodiert einen Keyset-Cursor (Sortierwerte der Grenzzeile + Richtung).
+"""
+def encode_cursor(values, direction="next", sort=""):
+    raw = json.dumps({"v": values, "d": direction, "s": sort}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort=""):
+    if not token:
+        return None, "next"
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        if data.get("s", "") != sort:
+            return None, "next"
+        return list(data["v"]), data.get("d", "next")
+    except (ValueError, KeyError, TypeError):
+        return None, "next"
+
+
+def _cursor_values(row, cols):
+    values = []
+    for c in cols:
+        v = row.get(c)
+        if v is None and c in _NULLABLE_SORT_FIELDS:
+            v = ""
+        elif c == 'price_per_unit' and v is not None:
+            v = float(v)
+        values.append(v)
+    return values
 
-    if filters["resource_name"]:
-        query += " AND resource_name LIKE %s"
-        params.append(f"%{filters['resource_name']}%")
 
-    if filters["region"]:
-        query += " AND region LIKE %s"
-        params.append(f"%{filters['region']}%")
+"""
+Baut die Seek-Bedingung (a > x) OR (a = x AND b > y) ... für die Sortierschlüssel.
+"""
+def _seek_clause(exprs, values, ascending):
+    op = ">" if ascending else "<"
+    ors = []
+    params = []
+    for i, expr in enumerate(exprs):
+        parts = [f"{exprs[j]} = %s" for j in range(i)] + [f"{expr} {op} %s"]
+        ors.append("(" + " AND ".join(parts) + ")")
+        params.extend(values[:i + 1])
+    return "(" + " OR ".join(ors) + ")", params
 
 
-    if sort_by == 'provider':
-        query += f" ORDER BY provider {order.upper()}, sku {order.upper()} LIMIT 3000"
-    else:
-        query += f" ORDER BY {sort_by} {order.upper()} LIMIT 3000"
+"""
+Baut die Abfrage einer Keyset-Seite (Filter, Seek ab values, ORDER BY auf
+den Sortierspalten + id, LIMIT; limit=None ohne LIMIT).
+"""
+def _page_query(filters, sort_by, order, values, backwards, limit):
+    exprs = _sort_columns(sort_by)
+    where, params = build_filter_clause(filters)
+    scan_asc = (order == 'asc') != backwards
+
+    query = f"SELECT * FROM cloud_prices WHERE {where}"
+    if values is not None:
+        seek, seek_params = _seek_clause(exprs, values, scan_asc)
+        query += f" AND {seek}"
+        params = params + seek_params
+    dir_sql = "ASC" if scan_asc else "DESC"
+    query += " ORDER BY " + ", ".join(f"{e} {dir_sql}" for e in exprs)
+    if limit is None:
+        return query, params
+    return query + " LIMIT %s", params + [limit]
 
 
-    cursor.execute(query, params)
-    result = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return result
+"""
+EXPLAIN der zweiten Seite (mit Seek) je Sortierfeld. 'filesort' bzw.
+'full_scan' zeigen, dass die Sortierung nicht über einen Index läuft.
+"""
+def explain_keyset_pages(filters=None, per_page=100):
+    filters = filters or {}
+    report = []
+    for sort_by in ALLOWED_SORT_FIELDS:
+        _, cursor, _ = get_prices_page(filters, sort_by, 'asc', per_page=1)
+        values, _ = decode_cursor(cursor, f"{sort_by}:asc")
+        query, params = _page_query(filters, sort_by, 'asc', values, False, per_page + 1)
+        with pooled_connection() as connection:
+            cur = connection.cursor(dictionary=True)
+            cur.execute(f"EXPLAIN {query}", params)
+            plan = cur.fetchall()
+            cur.close()
+        row = plan[0] if plan else {}
+        report.append({
+            "label": f"Sortierung {sort_by}",
+            "sort_by": sort_by,
+            "key": row.get("key"),
+            "type": row.get("type"),
+            "rows": row.get("rows"),
+            "filesort": "filesort" in (row.get("Extra") or ""),
+            "full_scan": row.get("type") == "ALL" or not row.get("key"),
+        })
+    return report
 
 
 """
-Holt einen Preis-Datensatz anhand der ID aus der Datenbank
+Holt eine Seite gefilterter Preise per Keyset-Pagination auf (Sortierfeld, id).
+Gibt (rows, next_cursor, prev_cursor) zurück; tiefe Seiten kosten so viel wie Seite 1.
 """
-def get_price_by_id(entry_id):
+def get_prices_page(filters, sort_by=None, order='asc', cursor=None, per_page=100):
+    sort_by, order = _normalize_sort(sort_by, order)
+    cols = _sort_columns(sort_by)
+    sort_key = f"{sort_by}:{order}"
+    values, direction = decode_cursor(cursor, sort_key)
+    if values is not None and len(values) != len(cols):
+        values, direction = None, "next"
+
+    backwards = (values is not None and direction == "prev")
+    query, params = _page_query(filters, sort_by, order, values, backwards, per_page + 1)
+
+    with pooled_connection() as connection:
+        cur = connection.cursor(dictionary=True)
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cur.close()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(_cursor_values(rows[-1], cols), "next", sort_key)
+        if values is not None and (has_more or not backwards):
+            prev_cursor = encode_cursor(_cursor_values(rows[0], cols), "prev", sort_key)
+    return rows, next_cursor, prev_cursor
+
+
+"""
+Liefert alle gefilterten Preise sortiert in Blöcken von batch_size Zeilen
+(höchstens limit Zeilen). Eine einzige, ungepufferte Abfrage auf einer
+eigenen Verbindung außerhalb des Pools: der Server liefert die Zeilen
+fortlaufend, im Speicher liegt nur der aktuelle Block. Wird der Generator
+vorzeitig geschlossen (Abbruch des Downloads), wird die Verbindung geschlossen.
+"""
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+
+def iter_filtered_prices(filters, sort_by=None, order='asc', batch_size=None, limit=None):
+    sort_by, order = _normalize_sort(sort_by, order)
+    query, params = _page_query(filters, sort_by, order, None, False, limit)
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+
     connection = mysql.connector.connect(
         host=os.getenv("DB_HOST"),
         database=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD")
     )
-    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        # ungelesene Zeilen verwirft der Server beim Schließen der Verbindung
+        try:
+            connection.close()
+        except Error:
+            pass
+
+
+"""
+Günstige Schätzung der Trefferanzahl: ohne Filter aus den Tabellenstatistiken,
+sonst ein auf COUNT_ESTIMATE_CAP begrenztes COUNT. Die Ergebnisse liegen in
+einem LRU mit höchstens DB_COUNT_CACHE_ENTRIES Einträgen und TTL; ändert sich
+last_updated.txt, wird er geleert.
+"""
+COUNT_ESTIMATE_CAP = int(os.getenv("DB_COUNT_ESTIMATE_CAP", "100000"))
+_COUNT_CACHE_MAX_ENTRIES = int(os.getenv("DB_COUNT_CACHE_ENTRIES", "512"))
+_COUNT_CACHE_TTL_SECONDS = 300
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+_count_cache_stamp = None
+
+
+def _cached_count(key, now):
+    global _count_cache_stamp
+    stamp = data_stamp()
+    with _count_cache_lock:
+        if stamp != _count_cache_stamp:
+            _count_cache.clear()
+            _count_cache_stamp = stamp
+        hit = _count_cache.get(key)
+        if hit is None:
+            return None
+        if now - hit[1] >= _COUNT_CACHE_TTL_SECONDS:
+            del _count_cache[key]
+            return None
+        _count_cache.move_to_end(key)
+        return hit[0]
+
+
+def _store_count(key, count, now):
+    with _count_cache_lock:
+        _count_cache[key] = (count, now)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > _COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.popitem(last=False)
+
+
+def estimate_filtered_count(filters):
+    where, params = build_filter_clause(filters)
+    key = (where, tuple(params))
+    now = time.time()
+    hit = _cached_count(key, now)
+    if hit is not None:
+        return hit
+
+    with pooled_connection() as connection:
+        cur = connection.cursor()
+        if where == "1=1":
+            cur.execute("""
+                SELECT TABLE_ROWS FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'cloud_prices'
+            """)
+        else:
+            cur.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM cloud_prices WHERE {where} LIMIT %s) t",
+                        params + [COUNT_ESTIMATE_CAP])
+        row = cur.fetchone()
+        cur.close()
+
+    count = int(row[0] or 0) if row else 0
+    _store_count(key, count, now)
+    return count
+
+
+"""
+Entfernt doppelte Einträge eines Providers direkt in der Datenbank (gleicher
+Service, SKU, Name, Region und Preis); behalten wird jeweils die kleinste id.
+Ersetzt das Deduplizieren pro Request.
+"""
+def delete_duplicate_prices(provider, table=PRICES_TABLE):
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            DELETE p FROM {table} p
+            JOIN (
+                SELECT MIN(id) AS keep_id, service, sku, resource_name, region,
+                       ROUND(price_per_unit, 6) AS price
+                FROM {table}
+                WHERE provider = %s
+                GROUP BY service, sku, resource_name, region, ROUND(price_per_unit, 6)
+                HAVING COUNT(*) > 1
+            ) d
+              ON p.provider = %s
+             AND p.service = d.service
+             AND p.sku = d.sku
+             AND p.resource_name <=> d.resource_name
+             AND p.region <=> d.region
+             AND ROUND(p.price_per_unit, 6) = d.price
+             AND p.id <> d.keep_id
+        """, (provider, provider))
+        deleted = cursor.rowcount
+        connection.commit()
+        cursor.close()
+    return deleted
+
+
+"""
+Holt einen Preis-Datensatz anhand der ID aus der Datenbank
+"""
+def get_price_by_id(entry_id):
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
 
-    cursor.execute("SELECT * FROM cloud_prices WHERE id = %s", (entry_id,))
-    row = cursor.fetchone()
+        cursor.execute("SELECT * FROM cloud_prices WHERE id = %s", (entry_id,))
+        row = cursor.fetchone()
 
-    cursor.close()
-    connection.close()
+        cursor.close()
 
     return row
 
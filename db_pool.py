@@ -0,0 +1,200 @@
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import os
+import queue
+import threading
+import time
+
+load_dotenv()
+
+
+"""
+Einstellungen des Connection-Pools. Die Größe richtet sich nach den
+gleichzeitigen Haltern: jeder Anbieter-Thread belegt beim Update eine
+Verbindung für seinen ganzen Schreibstrom (DB_POOL_WRITERS), daneben laufen
+HashIndex.load, Lösch- und Dublettenabfragen sowie im Web-Tier Snapshot- und
+Facetten-Ladevorgänge (DB_POOL_EXTRA). Mindestens Schreiber + 2.
+"""
+POOL_WRITERS = int(os.getenv("DB_POOL_WRITERS", "3"))
+POOL_EXTRA = int(os.getenv("DB_POOL_EXTRA", "4"))
+POOL_SIZE = max(int(os.getenv("DB_POOL_SIZE", "0")) or POOL_WRITERS + POOL_EXTRA, POOL_WRITERS + 2)
+POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT", "30"))       # max. Wartezeit auf eine freie Verbindung
+POOL_RECYCLE_S = float(os.getenv("DB_POOL_RECYCLE", "1800"))     # Verbindungen nach x Sekunden erneuern
+POOL_PING_AFTER_S = float(os.getenv("DB_POOL_PING_AFTER", "30")) # Health-Check, wenn länger unbenutzt
+
+
+"""
+Einfacher Thread-sicherer Pool für MySQL-Verbindungen mit Health-Checks,
+Recycling und Kennzahlen zu Checkouts und Wartezeiten.
+"""
+class ConnectionPool:
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT_S, recycle=POOL_RECYCLE_S, ping_after=POOL_PING_AFTER_S):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._meta = {}   # id(conn) → (erstellt, zuletzt benutzt)
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "wait_total_s": 0.0,
+            "wait_max_s": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_failures": 0,
+            "in_use": 0,
+        }
+
+    def _connect(self):
+        conn = mysql.connector.connect(
+            host=os.getenv("DB_HOST"),
+            database=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD")
+        )
+        now = time.monotonic()
+        with self._lock:
+            self._meta[id(conn)] = (now, now)
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._meta.pop(id(conn), None)
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def _healthy(self, conn):
+        created, last_used = self._meta.get(id(conn), (0.0, 0.0))
+        now = time.monotonic()
+        if self.recycle and now - created > self.recycle:
+            with self._lock:
+                self._stats["recycled"] += 1
+            return False
+        if now - last_used > self.ping_after:
+            try:
+                conn.ping(reconnect=False)
+            except Error:
+                with self._lock:
+                    self._stats["health_failures"] += 1
+                return False
+        return True
+
+    """
+    Holt eine Verbindung aus dem Pool (wartet maximal timeout Sekunden).
+    """
+    def acquire(self):
+        t0 = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolError(f"Keine freie DB-Verbindung nach {self.timeout:.0f}s (Poolgröße {self.size})")
+        waited = time.monotonic() - t0
+
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._connect()
+                    break
+                if not self._healthy(conn):
+                    self._discard(conn)
+                    conn = None
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_total_s"] += waited
+            self._stats["wait_max_s"] = max(self._stats["wait_max_s"], waited)
+            self._stats["in_use"] += 1
+        return conn
+
+    """
+    Gibt eine Verbindung an den Pool zurück. Offene Transaktionen werden
+    zurückgerollt, damit der nächste Nutzer einen frischen Snapshot sieht.
+    """
+    def release(self, conn):
+        try:
+            conn.rollback()
+            with self._lock:
+                created, _ = self._meta.get(id(conn), (time.monotonic(), 0.0))
+                self._meta[id(conn)] = (created, time.monotonic())
+            self._idle.put(conn)
+        except Error:
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    """
+    Schließt alle freien Verbindungen (z. B. nach einem Fork oder beim Beenden).
+    """
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    """
+    Gibt die Pool-Kennzahlen zurück (Checkouts, Wartezeiten, Recycling usw.).
+    """
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+        out["size"] = self.size
+        out["idle"] = self._idle.qsize()
+        out["wait_avg_s"] = out["wait_total_s"] / out["checkouts"] if out["checkouts"] else 0.0
+        return out
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+"""
+Gibt den prozessweiten Pool zurück (wird beim ersten Zugriff angelegt).
+"""
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+"""
+Kontextmanager für eine Verbindung aus dem Pool:
+    with pooled_connection() as connection: ...
+"""
+@contextmanager
+def pooled_connection():
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+"""
+Gibt die Kennzahlen des prozessweiten Pools zurück.
+"""
+def pool_stats():
+    return get_pool().stats()
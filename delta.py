@@ -0,0 +1,111 @@
+import os
+import hashlib
+from db_pool import pooled_connection
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+"""
+Aktualisierungsmodus: "full" schreibt jede Zeile per Upsert neu, "delta"
+schreibt nur neue und geänderte Zeilen und löscht verschwundene.
+"""
+REFRESH_MODE = os.getenv("REFRESH_MODE", "full").lower()
+
+"""
+Positionen in den Zeilen-Tupeln aus units.batch_to_rows
+(provider, instance_type, service, sku, resource_name, region, price_per_unit, unit, currency, canonical_service, ...)
+"""
+_KEY_FIELDS = (2, 3, 4, 5, 7)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(round(value, 10))
+    return str(value)
+
+
+"""
+Identität einer Preiszeile: (service, sku, resource_name, region, unit) als Digest.
+"""
+def row_key(row):
+    raw = "\x1f".join(_text(row[i]) for i in _KEY_FIELDS)
+    return hashlib.md5(raw.encode("utf-8")).digest()
+
+
+"""
+Inhalts-Hash über alle geschriebenen Spalten (Hex, passt in row_hash CHAR(32)).
+"""
+def row_hash(row):
+    raw = "\x1f".join(_text(v) for v in row)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+"""
+Hash-Index eines Anbieters aus dem letzten Lauf. Vergleicht die neuen Zeilen
+gegen den Bestand und merkt sich, welche Schlüssel im aktuellen Lauf vorkamen.
+"""
+class HashIndex:
+    def __init__(self, provider, entries):
+        self.provider = provider
+        self._entries = entries
+        self._seen = set()
+        self.inserted = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    """
+    Lädt (id, Schlüssel, row_hash) aller Zeilen eines Anbieters.
+    """
+    @classmethod
+    def load(cls, provider, batch_size=50000):
+        entries = {}
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT id, provider, instance_type, service, sku, resource_name, region,
+                       price_per_unit, unit, currency, row_hash
+                FROM cloud_prices
+                WHERE provider = %s
+            """, (provider,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for r in rows:
+                    entries.setdefault(row_key(r[1:10]), {})[r[10]] = r[0]
+            cursor.close()
+        return cls(provider, entries)
+
+    """
+    Gibt nur die neuen und geänderten Zeilen eines Chunks zurück.
+    Die Zeilen enthalten den row_hash als letzte Spalte.
+    """
+    def filter(self, rows):
+        out = []
+        for row in rows:
+            key = row_key(row)
+            self._seen.add(key)
+            known = self._entries.get(key)
+            if known is None:
+                self.inserted += 1
+                out.append(row)
+            elif row[-1] in known:
+                self.unchanged += 1
+            else:
+                self.changed += 1
+                out.append(row)
+        return out
+
+    """
+    IDs der Bestandszeilen, deren Schlüssel im aktuellen Lauf nicht mehr vorkam.
+    """
+    def stale_ids(self):
+        return [i for key, ids in self._entries.items() if key not in self._seen for i in ids.values()]
+
+    def summary(self, deleted=None):
+        deleted_text = "übersprungen" if deleted is None else str(deleted)
+        return (f"{self.provider}: Delta → neu {self.inserted}, geändert {self.changed}, "
+                f"unverändert {self.unchanged}, gelöscht {deleted_text}")
@@ -0,0 +1,121 @@
+import threading
+from db_pool import pooled_connection
+from service_catalog import canonical_service_keys
+from update_timestamp import data_stamp
+
+
+"""
+Facetten für die Filterauswahl: Werte je Anbieter mit Anzahl der Preise.
+Sie werden am Ende jedes Updates in FACET_TABLE geschrieben und von der
+Weboberfläche im Speicher gehalten (neu geladen, wenn sich last_updated.txt ändert).
+"""
+FACET_TABLE = "price_facets"
+FACET_COLUMNS = {
+    "region":   "region",
+    "service":  "canonical_service",
+    "unit":     "unit",
+    "currency": "currency",
+}
+
+
+def _count_rows(cursor):
+    rows = []
+    for facet, column in FACET_COLUMNS.items():
+        cursor.execute(f"""
+            SELECT provider, COALESCE({column}, ''), COUNT(*)
+            FROM cloud_prices
+            GROUP BY provider, COALESCE({column}, '')
+        """)
+        rows.extend((facet, p, v, n) for p, v, n in cursor.fetchall())
+    return rows
+
+
+"""
+Berechnet alle Facetten aus 'cloud_prices' neu und ersetzt den Inhalt von
+FACET_TABLE in einer Transaktion. Gibt die Anzahl der Facettenwerte zurück.
+Werte, die sich nur in Groß-/Kleinschreibung oder Leerzeichen am Ende
+unterscheiden (bzw. NULL neben ''), sind unter der Kollation der Tabelle
+derselbe Schlüssel; ihre Anzahlen werden zusammengezählt.
+"""
+def refresh_facets():
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        rows = _count_rows(cursor)
+        cursor.execute(f"DELETE FROM {FACET_TABLE}")
+        cursor.executemany(f"""
+            INSERT INTO {FACET_TABLE} (facet, provider, value, cnt) VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)
+        """, rows)
+        connection.commit()
+        cursor.close()
+    return len(rows)
+
+
+"""
+Facettenwerte im Speicher: facet → provider → {Wert: Anzahl}. Leere Werte
+(NULL) zählen in den Summen mit, erscheinen aber nicht in den Auswahllisten.
+"""
+class Facets:
+
+    def __init__(self, rows, stamp=None):
+        self.stamp = stamp
+        self._data = {facet: {} for facet in FACET_COLUMNS}
+        for facet, provider, value, count in rows:
+            self._data.setdefault(facet, {}).setdefault(provider, {})[value] = int(count)
+
+    def counts(self, facet, provider=None):
+        by_provider = self._data.get(facet, {})
+        if provider:
+            return dict(by_provider.get(provider, {}))
+        merged = {}
+        for values in by_provider.values():
+            for value, count in values.items():
+                merged[value] = merged.get(value, 0) + count
+        return merged
+
+    """
+    Sortierte Liste [(Wert, Anzahl)] ohne leere Werte.
+    """
+    def values(self, facet, provider=None):
+        return sorted((v, n) for v, n in self.counts(facet, provider).items() if v)
+
+    def total(self, provider=None):
+        return sum(self.counts("currency", provider).values())
+
+    """
+    Anzahl je Service-Bezeichnung der Oberfläche (über canonical_service_keys).
+    """
+    def service_count(self, provider, label):
+        counts = self.counts("service", provider)
+        return sum(counts.get(key, 0) for key in canonical_service_keys(provider, label))
+
+
+"""
+Lädt die Facetten aus FACET_TABLE; ist sie leer (z. B. vor dem ersten Update
+mit Facetten), werden sie einmalig direkt aus 'cloud_prices' gezählt.
+"""
+def load_facets(stamp=None):
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT facet, provider, value, cnt FROM {FACET_TABLE}")
+        rows = cursor.fetchall()
+        if not rows:
+            rows = _count_rows(cursor)
+        cursor.close()
+    return Facets(rows, stamp)
+
+
+_facets = None
+_facets_lock = threading.Lock()
+
+
+"""
+Gibt die Facetten des aktuellen Datenstands zurück (aus dem Speicher).
+"""
+def get_facets():
+    global _facets
+    stamp = data_stamp()
+    with _facets_lock:
+        if _facets is None or _facets.stamp != stamp:
+            _facets = load_facets(stamp)
+        return _facets
@@ -1,71 +1,220 @@
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta, timezone
 import requests
 import os
 import re
+import threading
 from dotenv import load_dotenv
+from service_catalog import is_gcp_persistent_disk
+import http_cache
 
 load_dotenv()
 
 
 """
-Erstellt ein Authentifikations Header mit Token für die GCP API
+Einstellungen für die Billing-API: Seitengröße (API-Maximum 5000) und wie
+lange vor Ablauf das Token erneuert wird.
 """
-def _get_headers():
-    key_path = os.getenv("GCP_SERVICE_ACCOUNT_JSON")
-    credentials = service_account.Credentials.from_service_account_file(
-        key_path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    credentials.refresh(Request())
-    token = credentials.token
-    return {"Authorization": f"Bearer {token}"}
+BILLING_API_URL = "https://cloudbilling.googleapis.com/v1"
+GCP_PAGE_SIZE = int(os.getenv("GCP_PAGE_SIZE", "5000"))
+_TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
 
 
 """
-Holt alle GCP-Billing-Services (mit id und Name), inkl. Pagination
+Langlebiger GCP-Client: hält die Service-Account-Credentials im Speicher,
+erneuert das Token nur kurz vor Ablauf und nutzt eine Keep-Alive-Session.
 """
-def _list_services(headers):
-    url = "https://cloudbilling.googleapis.com/v1/services"
-    out = []
-    next_page = url
-    while next_page:
-        r = requests.get(next_page, headers=headers, timeout=60)
+class GcpClient:
+
+    def __init__(self, key_path=None):
+        self.key_path = key_path or os.getenv("GCP_SERVICE_ACCOUNT_JSON")
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        self._credentials = None
+        self._lock = threading.Lock()
+        self.token_refreshes = 0
+
+    def _token(self):
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = service_account.Credentials.from_service_account_file(
+                    self.key_path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+                )
+            creds = self._credentials
+            expiry = creds.expiry.replace(tzinfo=timezone.utc) if creds.expiry else None
+            if not creds.token or expiry is None or expiry - datetime.now(timezone.utc) < _TOKEN_REFRESH_MARGIN:
+                creds.refresh(Request(self.session))
+                self.token_refreshes += 1
+            return creds.token
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self._token()}"}
+
+    """
+    GET über die gemeinsame Session (Token wird bei Bedarf erneuert).
+    """
+    def get(self, url, params=None, timeout=60):
+        r = self.session.get(url, params=params, headers=self.headers(), timeout=timeout)
         r.raise_for_status()
-        data = r.json()
-        out.extend(data.get("services", []))
-        token = data.get("nextPageToken")
-        next_page = f"{url}?pageToken={token}" if token else None
-    return out
+        return r
+
+    """
+    Blättert eine paginierte Billing-API-Liste mit maximaler Seitengröße durch.
+    Seiten kommen aus dem Seiten-Cache, solange er gültig ist. Läuft ein
+    pageToken aus einer zwischengespeicherten Seite ab, wird die Liste live
+    neu geladen. Gibt (items, Anzahl Seiten, übertragene Bytes) zurück.
+    """
+    def fetch_paged(self, url, key):
+        out = []
+        pages = 0
+        nbytes = 0
+        params = {"pageSize": GCP_PAGE_SIZE}
+        refresh = False
+        prev_source = "live"
+
+        def loader(validators):
+            nonlocal nbytes
+            r = self.session.get(url, params=params, timeout=60,
+                                 headers={**self.headers(), **validators})
+            if r.status_code == 304:
+                return None
+            r.raise_for_status()
+            nbytes += len(r.content)
+            return r.json(), r.headers.get("ETag"), r.headers.get("Last-Modified")
+
+        while True:
+            try:
+                data, source = http_cache.fetch_with_source("gcp", {"url": url, "params": params}, loader, refresh)
+            except requests.HTTPError:
+                if "pageToken" not in params or prev_source == "live" or refresh:
+                    raise
+                print(f"[GCP] pageToken aus dem Cache ungültig – lade {url} live neu")
+                out, pages, refresh = [], 0, True
+                params = {"pageSize": GCP_PAGE_SIZE}
+                continue
+            prev_source = source
+            pages += 1
+            out.extend(data.get(key, []))
+            token = data.get("nextPageToken")
+            if not token:
+                break
+            params = {"pageSize": GCP_PAGE_SIZE, "pageToken": token}
+        return out, pages, nbytes
+
+
+_client = None
+_client_lock = threading.Lock()
 
 
 """
-Sucht zu gegebenen Display-Namen die passenden GCP-Service-IDs
+Gibt den prozessweiten GCP-Client zurück (einmal anlegen & cachen).
 """
-def _resolve_service_ids(headers, wanted_names):
-    services = _list_services(headers)
-    name_to_id = {}
-    for alias, disp in wanted_names.items():
-        sid = next((s["name"].split("/")[-1] for s in services
-                    if s.get("displayName", "").strip().lower() == disp.lower()), None)
-        name_to_id[alias] = sid
-    return name_to_id
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GcpClient()
+        return _client
 
 
 """
-Lädt alle SKUs eines GCP-Services
+Katalog-Sitzung für einen Aktualisierungslauf: die Service-Liste wird einmal
+geladen und die SKUs jedes Services nur einmal abgerufen, auch wenn mehrere
+Getter (z. B. Compute Engine und Persistent Disk) denselben Service brauchen.
 """
-def _fetch_skus_for_service(headers, service_id):
-    base = f"https://cloudbilling.googleapis.com/v1/services/{service_id}/skus"
-    all_skus = []
-    next_page = base
-    while next_page:
-        r = requests.get(next_page, headers=headers, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-        all_skus.extend(data.get("skus", []))
-        token = data.get("nextPageToken")
-        next_page = f"{base}?pageToken={token}" if token else None
-    return all_skus
+class CatalogSession:
+
+    def __init__(self, client):
+        self.client = client
+        self._services = None
+        self._skus = {}
+        self._fetch_cost = {}
+        self._lock = threading.Lock()
+        self._service_locks = {}
+        self.stats = {"pages_fetched": 0, "bytes_fetched": 0, "pages_saved": 0, "bytes_saved": 0}
+
+    def _count(self, pages, nbytes, saved=False):
+        prefix = "saved" if saved else "fetched"
+        with self._lock:
+            self.stats[f"pages_{prefix}"] += pages
+            self.stats[f"bytes_{prefix}"] += nbytes
+
+    def services(self):
+        with self._lock:
+            if self._services is None:
+                services, pages, nbytes = self.client.fetch_paged(f"{BILLING_API_URL}/services", "services")
+                self._services = services
+                self._fetch_cost["__services__"] = (pages, nbytes)
+                self.stats["pages_fetched"] += pages
+                self.stats["bytes_fetched"] += nbytes
+            else:
+                pages, nbytes = self._fetch_cost["__services__"]
+                self.stats["pages_saved"] += pages
+                self.stats["bytes_saved"] += nbytes
+            return self._services
+
+    def service_id(self, display_name):
+        return next((s["name"].split("/")[-1] for s in self.services()
+                     if s.get("displayName", "").strip().lower() == display_name.lower()), None)
+
+    """
+    Gibt alle SKUs eines Services (Display-Name) zurück, pro Sitzung nur einmal geladen.
+    """
+    def skus(self, display_name):
+        with self._lock:
+            lock = self._service_locks.setdefault(display_name, threading.Lock())
+        with lock:
+            if display_name in self._skus:
+                self._count(*self._fetch_cost[display_name], saved=True)
+                return self._skus[display_name]
+            sid = self.service_id(display_name)
+            if not sid:
+                self._skus[display_name] = []
+                self._fetch_cost[display_name] = (0, 0)
+                return []
+            skus, pages, nbytes = self.client.fetch_paged(f"{BILLING_API_URL}/services/{sid}/skus", "skus")
+            self._count(pages, nbytes)
+            self._skus[display_name] = skus
+            self._fetch_cost[display_name] = (pages, nbytes)
+            return skus
+
+    def summary(self):
+        s = self.stats
+        return (f"GCP-Katalog: {s['pages_fetched']} Seiten / {s['bytes_fetched'] / 1e6:.1f} MB geladen, "
+                f"{s['pages_saved']} Seiten / {s['bytes_saved'] / 1e6:.1f} MB eingespart")
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+"""
+Gibt die Katalog-Sitzung des aktuellen Laufs zurück (einmal anlegen & cachen).
+"""
+def _catalog_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = CatalogSession(get_client())
+        return _session
+
+
+"""
+Verwirft die Katalog-Sitzung (nächster Zugriff lädt den Katalog neu).
+"""
+def reset_catalog_session():
+    global _session
+    with _session_lock:
+        _session = None
+
+
+"""
+Gibt die Einsparung der aktuellen Katalog-Sitzung als Text zurück.
+"""
+def catalog_summary():
+    return _session.summary() if _session is not None else "GCP-Katalog: keine Sitzung"
 
 
 """
@@ -141,14 +290,14 @@ def _map_sku_item(item, service_label_override=None):
 Holt alle GCP-Preise und gibt sie als Liste zurück
 """
 def get_gcp_prices():
-    headers = _get_headers()
-    url = "https://cloudbilling.googleapis.com/v1/services/6F81-5844-456A/skus"
+    client = get_client()
+    url = f"{BILLING_API_URL}/services/6F81-5844-456A/skus"
 
     all_prices = []
-    next_page = url
+    params = {"pageSize": GCP_PAGE_SIZE}
 
-    while next_page:
-        response = requests.get(next_page, headers=headers)
+    while params:
+        response = client.session.get(url, params=params, headers=client.headers(), timeout=60)
         if response.status_code == 200:
             data = response.json()
             skus = data.get("skus", [])
@@ -177,7 +326,7 @@ def get_gcp_prices():
                 })
 
             next_token = data.get("nextPageToken")
-            next_page = f"{url}?pageToken={next_token}" if next_token else None
+            params = {"pageSize": GCP_PAGE_SIZE, "pageToken": next_token} if next_token else None
         else:
             print(f"Fehler bei GCP Preis-API: {response.status_code}")
             break
@@ -186,104 +335,117 @@ def get_gcp_prices():
 
 
 """
-Holt und mapped alle Compute Engine SKUs aus der GCP-API
+Mapped alle SKUs eines Services mit festem Service-Label
 """
-def get_gcp_prices_compute_engine():
-    headers = _get_headers()
-    ids = _resolve_service_ids(headers, {"ce": "Compute Engine"})
-    sid = ids.get("ce")
-    if not sid:
-        return []
-    skus = _fetch_skus_for_service(headers, sid)
-    out = []
+def _map_skus(skus, label):
+    return list(_iter_skus(skus, label))
+
+
+def _iter_skus(skus, label):
     for it in skus:
-        mapped = _map_sku_item(it, service_label_override="Compute Engine")
+        mapped = _map_sku_item(it, service_label_override=label)
         if mapped:
-            out.append(mapped)
-    return out
+            yield mapped
+
+
+"""
+Filtert Compute-Engine-SKUs auf Persistent Disk und mapped sie
+"""
+def _map_persistent_disk(skus):
+    return list(_iter_persistent_disk(skus))
+
+
+def _iter_persistent_disk(skus):
+    disk = (it for it in skus if is_gcp_persistent_disk(it.get("description", ""), it.get("category")))
+    return _iter_skus(disk, "Persistent Disk")
+
+
+"""
+Checkpoint für einen GCP-Service: die Billing-API liefert wenige große Seiten,
+daher wird nur der ganze Service als erledigt markiert (ein fertiger Service
+wird beim Fortsetzen übersprungen, ohne die SKUs erneut zu laden).
+"""
+def _checkpointed(rows_factory, checkpoints):
+    if checkpoints is None:
+        return rows_factory()
+    return _iter_checkpointed(rows_factory, checkpoints.shard("*"))
+
+
+def _iter_checkpointed(rows_factory, cp):
+    if cp.done:
+        return
+    for row in rows_factory():
+        cp.rows += 1
+        yield row
+    yield cp.finished()
+
+
+"""
+Holt und mapped alle Compute Engine SKUs aus der GCP-API
+"""
+def get_gcp_prices_compute_engine():
+    return list(iter_gcp_prices_compute_engine())
+
+
+def iter_gcp_prices_compute_engine(checkpoints=None):
+    return _checkpointed(lambda: _iter_skus(_catalog_session().skus("Compute Engine"), "Compute Engine"), checkpoints)
 
 
 """
 Holt und mapped alle Cloud Storage SKUs aus der GCP-API
 """
 def get_gcp_prices_cloud_storage():
-    headers = _get_headers()
-    ids = _resolve_service_ids(headers, {"cs": "Cloud Storage"})
-    sid = ids.get("cs")
-    if not sid:
-        return []
-    skus = _fetch_skus_for_service(headers, sid)
-    out = []
-    for it in skus:
-        mapped = _map_sku_item(it, service_label_override="Cloud Storage")
-        if mapped:
-            out.append(mapped)
-    return out
+    return list(iter_gcp_prices_cloud_storage())
+
+
+def iter_gcp_prices_cloud_storage(checkpoints=None):
+    return _checkpointed(lambda: _iter_skus(_catalog_session().skus("Cloud Storage"), "Cloud Storage"), checkpoints)
 
 
 """
 Holt Compute Engine SKUs und filtert alle Persistent Disk relevanten Einträge
 """
 def get_gcp_prices_persistent_disk():
-    headers = _get_headers()
-    ids = _resolve_service_ids(headers, {"ce": "Compute Engine"})
-    sid = ids.get("ce")
-    if not sid:
-        return []
-    skus = _fetch_skus_for_service(headers, sid)
-
-    out = []
-    for it in skus:
-        cat = it.get("category", {}) or {}
-        text = f"{it.get('description','')} {cat.get('resourceGroup','')}".lower()
-        if ("persistent disk" in text) or ("pd-standard" in text) or ("pd-ssd" in text) \
-           or ("balanced pd" in text) or ("hyperdisk" in text) \
-           or (cat.get("resourceFamily") == "Storage" and "disk" in text):
-            mapped = _map_sku_item(it, service_label_override="Persistent Disk")
-            if mapped:
-                out.append(mapped)
-    return out
+    return list(iter_gcp_prices_persistent_disk())
+
+
+def iter_gcp_prices_persistent_disk(checkpoints=None):
+    return _checkpointed(lambda: _iter_persistent_disk(_catalog_session().skus("Compute Engine")), checkpoints)
 
 
 """
 Holt und mapped alle Cloud SQL SKUs aus der GCP-API
 """
 def get_gcp_prices_cloud_sql():
-    headers = _get_headers()
-    ids = _resolve_service_ids(headers, {"sql": "Cloud SQL"})
-    sid = ids.get("sql")
-    if not sid:
-        return []
-    skus = _fetch_skus_for_service(headers, sid)
-    out = []
-    for it in skus:
-        mapped = _map_sku_item(it, service_label_override="Cloud SQL")
-        if mapped:
-            out.append(mapped)
-    return out
+    return list(iter_gcp_prices_cloud_sql())
+
+
+def iter_gcp_prices_cloud_sql(checkpoints=None):
+    return _checkpointed(lambda: _iter_skus(_catalog_session().skus("Cloud SQL"), "Cloud SQL"), checkpoints)
 
 
 """
-Holt Preise für die 4 GCP-Dienste und gibt sie kombiniert zurück
+Holt Preise für die 4 GCP-Dienste in einem Durchgang: jeder Service wird
+einmal geladen und Compute Engine direkt an beide Mapper verteilt.
 """
 def get_gcp_prices_all_services():
+    session = _catalog_session()
     all_items = []
     try:
-        all_items.extend(get_gcp_prices_compute_engine())
+        ce_skus = session.skus("Compute Engine")
+        all_items.extend(_map_skus(ce_skus, "Compute Engine"))
+        all_items.extend(_map_persistent_disk(ce_skus))
     except Exception as e:
-        print("Compute Engine Fehler:", e)
+        print("Compute Engine / Persistent Disk Fehler:", e)
     try:
         all_items.extend(get_gcp_prices_cloud_storage())
     except Exception as e:
         print("Cloud Storage Fehler:", e)
-    try:
-        all_items.extend(get_gcp_prices_persistent_disk())
-    except Exception as e:
-        print("Persistent Disk Fehler:", e)
     try:
         all_items.extend(get_gcp_prices_cloud_sql())
     except Exception as e:
         print("Cloud SQL Fehler:", e)
+    print(session.summary())
     return all_items
 
 
@@ -305,4 +467,5 @@ if __name__ == "__main__":
     print("Persistent Disk:", len(pd))
     print("Cloud SQL:", len(sql))
     print("Summe neue GCP-Preise:", total)
+    print(catalog_summary())
 
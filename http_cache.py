@@ -0,0 +1,180 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+"""
+Einstellungen für den Seiten-Cache der API-Clients: Verzeichnis, Gültigkeit
+in Sekunden (negativ = nie ablaufen, z. B. zum lokalen Abspielen eines
+Katalogs) und maximale Größe; ältere, lange nicht genutzte Einträge werden
+zuerst entfernt (LRU über die Zugriffszeit der Datei).
+Die Gültigkeit liegt deutlich unter dem stündlichen Aktualisierungslauf: jeder
+Lauf holt frische Seiten, der Cache hilft nur bei Wiederholungen kurz danach
+(z. B. nach einem abgebrochenen Lauf).
+"""
+HTTP_CACHE = os.getenv("HTTP_CACHE", "1") == "1"
+HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", "cache/http"))
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "1200"))
+HTTP_CACHE_MAX_BYTES = int(float(os.getenv("HTTP_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+
+"""
+Komprimierter Seiten-Cache auf der Festplatte. Ein Eintrag enthält die
+dekodierte Antwort (JSON) sowie ETag/Last-Modified für die Revalidierung.
+"""
+class PageCache:
+
+    def __init__(self, directory=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self._announced = set()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    @staticmethod
+    def key(namespace, request):
+        raw = json.dumps([namespace, request], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json.gz"
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    """
+    Meldet den ersten Cache-Treffer je Namespace mit dem Alter der Seite,
+    damit im Log sichtbar ist, dass ein Lauf (teilweise) alte Seiten nutzt.
+    """
+    def _announce(self, namespace, entry):
+        with self._lock:
+            if namespace in self._announced:
+                return
+            self._announced.add(namespace)
+        age = time.time() - entry.get("stored", 0)
+        print(f"[Seiten-Cache] {namespace}: Seiten aus dem Cache (erste {age:.0f}s alt, TTL {self.ttl:.0f}s)")
+
+    def load(self, key):
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        return self.ttl < 0 or time.time() - entry.get("stored", 0) < self.ttl
+
+    def store(self, key, body, etag=None, last_modified=None):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        entry = {"stored": time.time(), "etag": etag, "last_modified": last_modified, "body": body}
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=5) as f:
+            json.dump(entry, f, separators=(",", ":"))
+        old = path.stat().st_size if path.exists() else 0
+        tmp.replace(path)
+        self._count("stored")
+        self._grow(path.stat().st_size - old)
+
+    def touch(self, key):
+        path = self._path(key)
+        try:
+            entry = self.load(key)
+            if entry is not None:
+                entry["stored"] = time.time()
+                self.store(key, entry["body"], entry.get("etag"), entry.get("last_modified"))
+        except OSError:
+            pass
+
+    def _files(self):
+        return [p for p in self.directory.glob("*/*.json.gz") if p.is_file()]
+
+    def _grow(self, delta):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self._files())
+            else:
+                self._size += delta
+            if self._size <= self.max_bytes:
+                return
+            files = sorted(self._files(), key=lambda p: p.stat().st_mtime)
+            target = self.max_bytes * 0.9
+            for p in files:
+                if self._size <= target:
+                    break
+                try:
+                    size = p.stat().st_size
+                    p.unlink()
+                except OSError:
+                    continue
+                self._size -= size
+                self.stats["evicted"] += 1
+
+    """
+    Liefert (body, Quelle) für eine Anfrage. Quelle ist "hit" (frisch aus dem
+    Cache), "revalidated" (304 vom Server) oder "live". loader(validators)
+    bekommt die Bedingungs-Header (If-None-Match / If-Modified-Since) und gibt
+    (body, etag, last_modified) zurück oder None, wenn der Server 304 meldet.
+    refresh=True überspringt frische Einträge (die Antwort wird trotzdem gespeichert).
+    """
+    def fetch(self, namespace, request, loader, refresh=False):
+        key = self.key(namespace, request)
+        entry = self.load(key)
+        if entry is not None and not refresh and self.is_fresh(entry):
+            self._count("hits")
+            self._announce(namespace, entry)
+            return entry["body"], "hit"
+
+        validators = {}
+        if entry is not None and not refresh:
+            if entry.get("etag"):
+                validators["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                validators["If-Modified-Since"] = entry["last_modified"]
+
+        result = loader(validators)
+        if result is None and entry is not None:
+            self._count("revalidated")
+            self.touch(key)
+            return entry["body"], "revalidated"
+
+        body, etag, last_modified = result
+        self._count("misses")
+        self.store(key, body, etag, last_modified)
+        return body, "live"
+
+
+_cache = PageCache()
+
+
+"""
+Holt eine Seite über den gemeinsamen Cache (bei HTTP_CACHE=0 immer live).
+Gibt (body, Quelle) zurück, siehe PageCache.fetch.
+"""
+def fetch_with_source(namespace, request, loader, refresh=False):
+    if not HTTP_CACHE:
+        body, _, _ = loader({})
+        return body, "live"
+    return _cache.fetch(namespace, request, loader, refresh=refresh)
+
+
+def fetch(namespace, request, loader, refresh=False):
+    return fetch_with_source(namespace, request, loader, refresh)[0]
+
+
+def cache_stats():
+    with _cache._lock:
+        return dict(_cache.stats)
@@ -1,5 +1,12 @@
-from db import insert_prices, select_all_prices, delete_provider_prices
+from db import insert_prices, select_all_prices, delete_provider_prices, delete_duplicate_prices, delete_prices_by_id, PRICES_TABLE
+from delta import REFRESH_MODE, HashIndex
+from checkpoint import Marker, checkpoint_store, REFRESH_RESUME
 from update_timestamp import update_timestamp
+from db_pool import pool_stats
+from http_cache import cache_stats, HTTP_CACHE_TTL
+from facets import refresh_facets
+from schema import ensure_schema, create_shadow_table, copy_provider_rows, swap_shadow_table
+from pipeline import merge_streams, batched, flatten
 from datetime import datetime
 import time
 import threading
@@ -8,26 +15,27 @@ import csv
 
 # Azure: alle Dienste
 from azure_client import (
-    get_azure_vm_prices,
-    get_azure_blob_prices,
-    get_azure_disk_prices,
-    get_azure_sql_prices,
+    iter_azure_vm_prices,
+    iter_azure_storage_prices,
+    iter_azure_sql_prices,
 )
 
 # AWS: alle Dienste 
 from aws_client import (
-    get_aws_prices_ec2,          
-    get_aws_prices_s3,
-    get_aws_prices_ebs,
-    get_aws_prices_rds,
+    iter_aws_prices_ec2,
+    iter_aws_prices_s3,
+    iter_aws_prices_ebs,
+    iter_aws_prices_rds,
 )
 
 # GCP: alle Dienste 
 from gcp_client import ( 
-    get_gcp_prices_compute_engine,
-    get_gcp_prices_cloud_storage,
-    get_gcp_prices_persistent_disk,
-    get_gcp_prices_cloud_sql,
+    iter_gcp_prices_compute_engine,
+    iter_gcp_prices_cloud_storage,
+    iter_gcp_prices_persistent_disk,
+    iter_gcp_prices_cloud_sql,
+    reset_catalog_session,
+    catalog_summary,
 )
 
 
@@ -87,64 +95,188 @@ Hauptfunktion: Ruft Azure-, AWS- und GCP-Preise ab, speichert sie und zeigt Info
 """
 SERVICE_FUNCS = {
     "Azure": [
-        ("Virtual Machines",            get_azure_vm_prices),
-        ("Blob Storage",                get_azure_blob_prices),
-        ("Disk Storage",                get_azure_disk_prices),
-        ("SQL Database",                get_azure_sql_prices),
+        ("Virtual Machines",            iter_azure_vm_prices),
+        ("Blob & Disk Storage",         iter_azure_storage_prices),
+        ("SQL Database",                iter_azure_sql_prices),
     ],
     "AWS": [
-        ("EC2",                         get_aws_prices_ec2),
-        ("S3",                          get_aws_prices_s3),
-        ("EBS",                         get_aws_prices_ebs),
-        ("RDS",                         get_aws_prices_rds),
+        ("EC2",                         iter_aws_prices_ec2),
+        ("S3",                          iter_aws_prices_s3),
+        ("EBS",                         iter_aws_prices_ebs),
+        ("RDS",                         iter_aws_prices_rds),
     ],
     "GCP": [ 
-        ("Compute Engine",              get_gcp_prices_compute_engine),
-        ("Cloud Storage",               get_gcp_prices_cloud_storage),
-        ("Persistent Disk",             get_gcp_prices_persistent_disk),
-        ("Cloud SQL",                   get_gcp_prices_cloud_sql),
+        ("Compute Engine",              iter_gcp_prices_compute_engine),
+        ("Cloud Storage",               iter_gcp_prices_cloud_storage),
+        ("Persistent Disk",             iter_gcp_prices_persistent_disk),
+        ("Cloud SQL",                   iter_gcp_prices_cloud_sql),
     ],
 }
 
 
 """
-Ruft alle Preisdaten für einen Anbieter ab und speichert sie in der Datenbank
+Wie viele Services eines Anbieters gleichzeitig abgerufen werden. AWS drosselt
+selbst adaptiv; Azure und GCP teilen sich ein Rate-Limit und laufen seriell.
 """
-def process_provider(provider: str):
+SERVICE_WORKERS = {
+    "AWS": 4,
+    "Azure": 1,
+    "GCP": 1,
+}
+
+
+"""
+Streamt einen Service in Batches; Anzahl und Fehler werden protokolliert.
+Ein Fehler beendet nur den Strom dieses Services, die übrigen laufen weiter.
+Mit checkpoints (ServiceCheckpoints) setzt der Service einen unterbrochenen Lauf fort.
+"""
+def _stream_service(provider, label, func, failed=None, checkpoints=None):
+    count = 0
+    try:
+        print(f"{provider}: {label} abrufen…")
+        for batch in batched(func(checkpoints=checkpoints) or []):
+            count += sum(1 for entry in batch if not isinstance(entry, Marker))
+            yield batch
+        state = f" ({checkpoints.describe()})" if checkpoints is not None else ""
+        print(f"{provider}: {label}: {count} Preise{state}")
+    except Exception as e:
+        print(f"{provider}: {label} FEHLER nach {count} Preisen → {e}")
+        if failed is not None:
+            failed.append(label)
+
+
+"""
+Vor- und Nachbereitung je Anbieter (z. B. GCP-Katalog-Sitzung pro Lauf)
+"""
+PROVIDER_SETUP = {
+    "GCP": reset_catalog_session,
+}
+PROVIDER_SUMMARY = {
+    "GCP": catalog_summary,
+}
+
+
+"""
+Ruft alle Preisdaten für einen Anbieter ab und speichert sie in der Datenbank.
+Abruf und Schreiben laufen überlappend: die Services liefern Batches über eine
+begrenzte Queue, der Writer schreibt Chunks, während weitere Seiten geladen werden.
+Im Delta-Modus (REFRESH_MODE=delta) werden nur neue und geänderte Zeilen
+geschrieben; verschwundene Zeilen werden nur gelöscht, wenn kein Service fehlschlug.
+Mit table wird in eine andere Tabelle geschrieben (Schattentabelle bei REFRESH_MODE=swap);
+fehlgeschlagene Services werden nach dem Schreiben in failed_by_provider vermerkt.
+Checkpoints: ein abgebrochener Lauf wird ab den gespeicherten Positionen
+fortgesetzt; erst ein vollständiger Lauf löscht die Checkpoints des Anbieters.
+Im Swap-Modus werden Checkpoints weder gelesen noch geschrieben, da die
+Schattentabelle jedes Mal neu entsteht (ein gespeicherter Stand eines
+unterbrochenen Laufs auf 'cloud_prices' bleibt unverändert).
+Ein Datenbankfehler beim Schreiben (Deadlock, Verbindungsabbruch, Pool-Timeout)
+gilt als Fehlschlag des Anbieters: kein Löschen, Checkpoints bleiben erhalten.
+"""
+def process_provider(provider: str, table=PRICES_TABLE, failed_by_provider=None):
     start, _ = log_start(provider)
+    if provider in PROVIDER_SETUP:
+        PROVIDER_SETUP[provider]()
+
+    store = checkpoint_store() if table == PRICES_TABLE else None
+    resumed = store is not None and store.begin(provider, resume=REFRESH_RESUME)
+    print(f"{provider}: {'setze unterbrochenen Lauf fort' if resumed else 'neuer Lauf'}")
+
+    failed = []
+    index = None
+    written = 0
+    stream = None
+    try:
+        index = HashIndex.load(provider) if REFRESH_MODE == "delta" else None
+        factories = [lambda label=label, func=func: _stream_service(
+                         provider, label, func, failed,
+                         store.service(provider, label) if store is not None else None)
+                     for label, func in SERVICE_FUNCS[provider]]
+        stream = flatten(merge_streams(factories, max_workers=SERVICE_WORKERS.get(provider, 1)))
+        written = insert_prices(stream, provider=provider, delta=index, table=table, checkpoints=store)
+    except Exception as e:
+        print(f"{provider}: Schreiben FEHLER → {e}")
+        failed.append(f"Datenbank ({type(e).__name__})")
+        if stream is not None:
+            stream.close()
+    if failed_by_provider is not None:
+        failed_by_provider[provider] = failed
+    if store is not None and not failed:
+        store.finish(provider)
+    if provider in PROVIDER_SUMMARY:
+        print(PROVIDER_SUMMARY[provider]())
+
+    if index is not None:
+        deleted = None
+        if failed:
+            print(f"{provider}: Löschen übersprungen, fehlgeschlagen: {', '.join(failed)}")
+        elif resumed:
+            print(f"{provider}: Löschen übersprungen, Lauf wurde fortgesetzt")
+        else:
+            deleted = delete_prices_by_id(index.stale_ids())
+        print(index.summary(deleted))
 
-    all_rows = []
-    for label, func in SERVICE_FUNCS[provider]:
-        try:
-            print(f"{provider}: {label} abrufen…")
-            rows = func() or []
-            print(f"{provider}: {label}: {len(rows)} Preise")
-            all_rows.extend(rows)
-        except Exception as e:
-            print(f"{provider}: {label} FEHLER → {e}")
+    if written:
+        removed = delete_duplicate_prices(provider, table=table)
+        if removed:
+            print(f"{provider}: {removed} doppelte Einträge entfernt")
+    print(f"{provider}: Gesamt gespeichert: {written}")
+    log_end(start, provider, written)
 
-    if all_rows:
-        insert_prices(all_rows, provider=provider)
-    print(f"{provider}: Gesamt gespeichert: {len(all_rows)}")
-    log_end(start, provider, len(all_rows))
 
 
+"""
+Abschluss für REFRESH_MODE=swap: Anbieter mit Fehlern (oder ohne Ergebnis)
+behalten ihre bisherigen Zeilen, danach wird die Schattentabelle eingetauscht.
+"""
+def _swap_in(providers, failed_by_provider):
+    for provider in providers:
+        failed = failed_by_provider.get(provider)
+        if failed is None or failed:
+            copied = copy_provider_rows(provider)
+            print(f"{provider}: Abruf unvollständig – {copied} bisherige Preise übernommen")
+    swap_shadow_table()
+    print("Schattentabelle eingetauscht.")
+
 
 """
 Führt den Update-Prozess aus und protokolliert Startzeit, Endzeit und Dauer
 """
 def run_update():
+    ensure_schema()
     providers = ("Azure", "AWS", "GCP")
-    threads = [threading.Thread(target=process_provider, args=(prov,)) for prov in providers]
+    swap = REFRESH_MODE == "swap"
+    table = create_shadow_table() if swap else PRICES_TABLE
+    failed_by_provider = {}
+    threads = [threading.Thread(target=process_provider, args=(prov, table, failed_by_provider))
+               for prov in providers]
 
     for t in threads:
         t.start()
     for t in threads:
         t.join()
 
+    if swap:
+        _swap_in(providers, failed_by_provider)
+
+    incomplete = [p for p in providers if failed_by_provider.get(p) is None or failed_by_provider[p]]
+    if incomplete:
+        details = ", ".join(f"{p} ({', '.join(failed_by_provider.get(p) or ['abgebrochen'])})" for p in incomplete)
+        print(f"WARNUNG: Aktualisierung unvollständig für {details} – bisherige Zeilen bleiben erhalten")
+
+    try:
+        print(f"Facetten: {refresh_facets()} Werte neu gezählt")
+    except Exception as e:
+        print(f"Facetten konnten nicht aktualisiert werden: {e}")
     update_timestamp()
     print(f"[{datetime.now().strftime('%H:%M:%S')}] Letzte Aktualisierung.")
 
+    stats = pool_stats()
+    print(f"DB-Pool: {stats['checkouts']} Checkouts, Wartezeit Ø {stats['wait_avg_s']*1000:.1f} ms / "
+          f"max {stats['wait_max_s']*1000:.1f} ms, {stats['created']} Verbindungen aufgebaut")
+    cs = cache_stats()
+    print(f"Seiten-Cache: {cs['hits']} Treffer, {cs['revalidated']} revalidiert, "
+          f"{cs['misses']} live geladen, {cs['evicted']} verdrängt (TTL {HTTP_CACHE_TTL:.0f}s)")
+
 
 """
 Führt den Update-Prozess aus und protokolliert Startzeit, Endzeit und Dauer
@@ -0,0 +1,214 @@
+import os
+import time
+import uuid
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from fpdf import FPDF
+from dotenv import load_dotenv
+from db import iter_filtered_prices
+
+load_dotenv()
+
+
+"""
+Einstellungen für PDF-Berichte: höchstens PDF_MAX_ROWS Zeilen je Bericht,
+bis PDF_SYNC_ROWS Zeilen wird direkt im Request erzeugt, darüber als
+Hintergrundjob. Fertige Dateien liegen PDF_REPORT_TTL Sekunden in PDF_REPORT_DIR.
+"""
+PDF_MAX_ROWS = int(os.getenv("PDF_MAX_ROWS", "5000"))
+PDF_SYNC_ROWS = int(os.getenv("PDF_SYNC_ROWS", "1000"))
+PDF_REPORT_DIR = Path(os.getenv("PDF_REPORT_DIR", "cache/reports"))
+PDF_REPORT_TTL_S = float(os.getenv("PDF_REPORT_TTL", "3600"))
+PDF_JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", "1"))
+
+FONT_PATH = Path(__file__).resolve().parent / "static" / "fonts" / "DejaVuSans.ttf"
+
+HEADERS = ["Anbieter", "Instance Type", "Service", "SKU", "Resource Name", "Region", "Preis", "Einheit", "Währung"]
+COL_WIDTHS = [22, 28, 30, 32, 62, 36, 25, 22, 20]   # Summe 277 mm = A4 quer ohne Ränder
+
+_MARGIN = 10
+_TOP = 28
+_BOTTOM = 195
+_ROW_H = 5.5
+_FONT_SIZE = 7.5
+
+
+"""
+Leeres Dokument mit geladener Schrift. Jeder Bericht bekommt ein eigenes
+FPDF-Objekt samt add_font: die Schrift merkt sich die benutzten Glyphen für
+das Subsetting, eine geteilte (kopierte) Vorlage würde diesen Stand zwischen
+Berichten vermischen. Das Einlesen der TTF-Datei kostet rund 25 ms.
+"""
+def _new_document():
+    pdf = FPDF(orientation="L", unit="mm", format="A4")
+    pdf.add_font("DejaVu", "", str(FONT_PATH))
+    pdf.set_auto_page_break(False)
+    pdf.set_font("DejaVu", "", _FONT_SIZE)
+    return pdf
+
+
+def _values(row):
+    price = row["price_per_unit"]
+    return [
+        row["provider"],
+        row.get("instance_type", ""),
+        row["service"],
+        row["sku"],
+        row["resource_name"],
+        row["region"],
+        f"{price:.6f}" if price is not None else "",
+        row["unit"],
+        row["currency"],
+    ]
+
+
+"""
+Kürzt einen Text auf die Spaltenbreite (Zeichenbudget statt Breitenmessung je Zelle).
+"""
+def _clip(text, max_chars):
+    text = "" if text is None else str(text)
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+"""
+Zeichnet eine Tabelle blockweise: je Seite Kopfzeile, Zeilentexte und
+Trennlinien direkt per text()/line() statt einer cell()-Zelle je Wert.
+Gibt (pdf_bytes, geschriebene Zeilen, gekürzt) zurück.
+"""
+def render_table(batches, title, max_rows=PDF_MAX_ROWS):
+    pdf = _new_document()
+    xs = [_MARGIN]
+    for w in COL_WIDTHS:
+        xs.append(xs[-1] + w)
+    budgets = [max(4, int((w - 2) / 1.55)) for w in COL_WIDTHS]
+    state = {"y": None, "page_top": None}
+
+    def close_page():
+        if state["y"] is None:
+            return
+        for x in xs:
+            pdf.line(x, state["page_top"], x, state["y"])
+
+    def new_page():
+        close_page()
+        pdf.add_page()
+        pdf.set_font_size(11)
+        pdf.text(_MARGIN, 16, title)
+        pdf.set_font_size(_FONT_SIZE)
+        y = _TOP - _ROW_H
+        pdf.set_fill_color(235, 235, 235)
+        pdf.rect(_MARGIN, y, xs[-1] - _MARGIN, _ROW_H, style="DF")
+        for x, header in zip(xs, HEADERS):
+            pdf.text(x + 1, y + _ROW_H - 1.6, header)
+        state["page_top"] = y
+        state["y"] = _TOP
+
+    written = 0
+    truncated = False
+    new_page()
+    for rows in batches:
+        for row in rows:
+            if written >= max_rows:
+                truncated = True
+                break
+            if state["y"] + _ROW_H > _BOTTOM:
+                new_page()
+            y = state["y"]
+            for x, value, budget in zip(xs, _values(row), budgets):
+                pdf.text(x + 1, y + _ROW_H - 1.6, _clip(value, budget))
+            y += _ROW_H
+            pdf.line(_MARGIN, y, xs[-1], y)
+            state["y"] = y
+            written += 1
+        if truncated:
+            break
+    close_page()
+
+    if truncated:
+        pdf.set_font_size(9)
+        pdf.text(_MARGIN, min(state["y"] + 6, 205),
+                 f"Gekürzt auf {max_rows} Zeilen – für den vollständigen Datenbestand bitte den CSV-Export verwenden.")
+    return bytes(pdf.output()), written, truncated
+
+
+"""
+Erzeugt den Preisbericht für Filter und Sortierung (wie die Startseite).
+"""
+def render_prices_pdf(filters, sort_by=None, order="asc", max_rows=PDF_MAX_ROWS):
+    batch_size = max(1, min(max_rows + 1, 2000))
+    batches = iter_filtered_prices(filters, sort_by, order, batch_size=batch_size, limit=max_rows + 1)
+    try:
+        return render_table(batches, "Preisliste (gefiltert)", max_rows)
+    finally:
+        batches.close()
+
+
+"""
+Hintergrundjobs für große PDF-Berichte. Der Status liegt im Speicher des
+Prozesses, die fertige Datei in PDF_REPORT_DIR; alte Jobs werden beim
+nächsten Auftrag aufgeräumt.
+"""
+class ReportJobs:
+
+    def __init__(self, directory=PDF_REPORT_DIR, workers=PDF_JOB_WORKERS, ttl=PDF_REPORT_TTL_S):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pdf-report")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _cleanup(self):
+        now = time.time()
+        with self._lock:
+            old = [job_id for job_id, job in self._jobs.items()
+                   if job["status"] in ("done", "failed") and now - job["created"] > self.ttl]
+            for job_id in old:
+                job = self._jobs.pop(job_id)
+                if job.get("path"):
+                    Path(job["path"]).unlink(missing_ok=True)
+
+    def _run(self, job_id, filters, sort_by, order):
+        started = time.time()
+        try:
+            pdf_bytes, written, truncated = render_prices_pdf(filters, sort_by, order)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{job_id}.pdf"
+            tmp = path.with_suffix(".part")
+            tmp.write_bytes(pdf_bytes)
+            tmp.replace(path)
+            update = {"status": "done", "path": str(path), "rows": written, "truncated": truncated}
+            print(f"PDF-Bericht {job_id}: {written} Zeilen in {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"PDF-Bericht {job_id} fehlgeschlagen: {e}")
+            update = {"status": "failed", "error": str(e)}
+        with self._lock:
+            self._jobs[job_id].update(update)
+
+    """
+    Startet einen Bericht im Hintergrund und gibt die Job-ID zurück.
+    """
+    def submit(self, filters, sort_by=None, order="asc"):
+        self._cleanup()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"status": "pending", "created": time.time()}
+        self._executor.submit(self._run, job_id, dict(filters), sort_by, order)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def report_jobs():
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = ReportJobs()
+        return _jobs
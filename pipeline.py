@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+"""
+Größe der Puffer zwischen den Pipeline-Stufen (Anzahl Batches in der Queue
+bzw. Zeilen pro Batch). Der Speicherbedarf bleibt damit unabhängig von der
+Katalog-Größe ungefähr konstant.
+"""
+STREAM_BUFFER_BATCHES = int(os.getenv("STREAM_BUFFER_BATCHES", "32"))
+STREAM_BATCH_ROWS = int(os.getenv("STREAM_BATCH_ROWS", "1000"))
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+"""
+Fasst einen Zeilenstrom zu Listen mit höchstens size Einträgen zusammen.
+"""
+def batched(iterable, size=STREAM_BATCH_ROWS):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+"""
+Gibt die Einträge eines Batch-Stroms einzeln weiter.
+"""
+def flatten(batches):
+    for batch in batches:
+        yield from batch
+
+
+"""
+Führt mehrere Generatoren parallel in Threads aus und liefert ihre Elemente
+über eine begrenzte Queue (Backpressure: volle Queue bremst die Produzenten).
+factories sind Funktionen ohne Argumente, die je einen Generator liefern.
+Ein Fehler in einem Produzenten wird beim Konsumenten erneut ausgelöst.
+Optional kann ein bestehender (gemeinsam begrenzter) Executor genutzt werden.
+"""
+def merge_streams(factories, executor=None, max_workers=4, maxsize=STREAM_BUFFER_BATCHES):
+    factories = list(factories)
+    q = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(factory):
+        try:
+            for item in factory():
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            put(_DONE)
+
+    own_pool = executor is None
+    pool = executor or ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="stream")
+    for factory in factories:
+        pool.submit(produce, factory)
+
+    pending = len(factories)
+    try:
+        while pending:
+            item = q.get()
+            if item is _DONE:
+                pending -= 1
+                continue
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        if own_pool:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,89 @@
+import re
+from service_catalog import SERVICE_GROUPS
+
+
+"""
+Strukturierte Attribute einer Preiszeile, die beim Import aus den Rohdaten
+abgeleitet und als eigene, indizierte Spalten gespeichert werden.
+"""
+ATTRIBUTE_COLUMNS = ["family", "vcpu", "memory_gib", "storage_class"]
+
+_VCPU_RE = re.compile(r"(\d+(?:\.\d+)?)\s*vcpu", re.IGNORECASE)
+_MEMORY_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*gib", re.IGNORECASE)
+_AWS_TYPE_RE = re.compile(r"^(?:db\.)?[a-z][a-z0-9-]*\.[a-z0-9]+$", re.IGNORECASE)
+_AZURE_VM_RE = re.compile(r"^(?:standard_|basic_)?([a-z]+)(\d+)(?:-(\d+))?([a-z]*)(?:_(v\d+))?", re.IGNORECASE)
+_GCP_SERIES_RE = re.compile(r"^(?:preemptible |spot )?([a-z]\d[a-z]?|e2|f1|g1)\b", re.IGNORECASE)
+
+"""
+Speicherklassen-Stichwörter (Azure/GCP); die spezifischeren zuerst.
+"""
+STORAGE_CLASS_KEYWORDS = [
+    ("premium ssd v2", "Premium SSD v2"),
+    ("premium ssd", "Premium SSD"),
+    ("standard ssd", "Standard SSD"),
+    ("standard hdd", "Standard HDD"),
+    ("ultra", "Ultra"),
+    ("nearline", "Nearline"),
+    ("coldline", "Coldline"),
+    ("archive", "Archive"),
+    ("cool", "Cool"),
+    ("cold", "Cold"),
+    ("hot", "Hot"),
+    ("balanced", "Balanced"),
+    ("extreme", "Extreme"),
+    ("ssd", "SSD"),
+    ("premium", "Premium"),
+    ("standard", "Standard"),
+]
+
+
+def _number(value):
+    if value is None:
+        return None
+    m = re.search(r"\d[\d,]*(?:\.\d+)?", str(value))
+    return float(m.group(0).replace(",", "")) if m else None
+
+
+def _first(pattern, text):
+    m = pattern.search(text or "")
+    return float(m.group(1).replace(",", "")) if m else None
+
+
+def _storage_class(provider, entry):
+    if provider == "AWS":
+        value = entry.get("instance_type")
+        return value[:32] if value and value != "unknown" else None
+    text = f"{entry.get('resource_name') or ''} {entry.get('instance_type') or ''}".lower()
+    return next((label for key, label in STORAGE_CLASS_KEYWORDS if key in text), None)
+
+
+"""
+Leitet family, vcpu, memory_gib und storage_class für einen Preiseintrag ab.
+Rohwerte der Mapper ("vcpu", "memory") haben Vorrang vor dem Text in resource_name.
+"""
+def parse_attributes(provider, entry):
+    attrs = dict.fromkeys(ATTRIBUTE_COLUMNS)
+    group = SERVICE_GROUPS.get(entry.get("canonical_service") or "")
+    itype = entry.get("instance_type") or ""
+    name = entry.get("resource_name") or ""
+
+    if group in ("object-storage", "block-storage"):
+        attrs["storage_class"] = _storage_class(provider, entry)
+        return attrs
+
+    if provider == "AWS":
+        if _AWS_TYPE_RE.match(itype):
+            attrs["family"] = itype.rsplit(".", 1)[0]
+        attrs["vcpu"] = _number(entry.get("vcpu")) if entry.get("vcpu") else _first(_VCPU_RE, name)
+        attrs["memory_gib"] = _number(entry.get("memory")) if entry.get("memory") else _first(_MEMORY_RE, name)
+    elif provider == "Azure" and group == "compute":
+        m = _AZURE_VM_RE.match(entry.get("sku") or itype)
+        if m:
+            letters, cores, constrained, suffix, version = m.groups()
+            attrs["family"] = f"{letters.upper()}{suffix or ''}" + (f"_{version}" if version else "")
+            attrs["vcpu"] = float(constrained or cores)
+    elif provider == "GCP" and group == "compute":
+        m = _GCP_SERIES_RE.match(name)
+        if m:
+            attrs["family"] = m.group(1).lower()
+    return attrs
@@ -0,0 +1,181 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from email.utils import formatdate, parsedate_to_datetime
+from flask import request, make_response
+from dotenv import load_dotenv
+from snapshot import PRICE_SNAPSHOT, snapshot_version
+from update_timestamp import data_stamp
+
+load_dotenv()
+
+
+"""
+Einstellungen des Antwort-Caches der Weboberfläche: Anzahl Einträge und
+Gesamtgröße (LRU). Der Cache gilt je Datenstand; ändert sich last_updated.txt,
+werden alle Einträge verworfen.
+"""
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+
+"""
+Datenstand als (Token, Zeitpunkt in Sekunden); ohne last_updated.txt ("0", None).
+Der Stand des geladenen Snapshots gehört dazu, damit während eines Neuladens
+erzeugte Seiten nicht unter dem neuen Stand gespeichert werden. Solange der
+Snapshot nicht dem Stand der Datei entspricht, gibt es keinen Zeitpunkt:
+dann weder Last-Modified noch 304 auf If-Modified-Since, nur das ETag gilt.
+"""
+def data_version():
+    loaded = snapshot_version()
+    stamp = data_stamp()
+    if stamp is None:
+        return f"0/{loaded}", None
+    mtime_ns, size = stamp
+    consistent = not PRICE_SNAPSHOT or loaded == stamp
+    return f"{mtime_ns:x}-{size:x}/{loaded}", mtime_ns // 1_000_000_000 if consistent else None
+
+
+"""
+Normalisierte Request-Argumente: sortiert, leere Werte entfernt, Mehrfachwerte
+(z. B. ids bei /compare) als Liste in der übergebenen Reihenfolge.
+"""
+def normalize_args(args):
+    items = []
+    for key in sorted(args.keys()):
+        values = [v for v in args.getlist(key) if v != ""]
+        if values:
+            items.append((key, values))
+    return items
+
+
+"""
+LRU-Cache fertiger Antworten (Body, Status, Header) mit Zählern.
+"""
+class ResponseCache:
+
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "stored": 0, "evicted": 0, "invalidated": 0}
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.stats["invalidated"] += len(self._entries)
+            self._entries.clear()
+            self._size = 0
+            self._version = version
+
+    def get(self, version, key):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, version, key, entry):
+        size = len(entry[0])
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = entry
+            self._size += size
+            self.stats["stored"] += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, dropped = self._entries.popitem(last=False)
+                self._size -= len(dropped[0])
+                self.stats["evicted"] += 1
+
+    def snapshot_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update(entries=len(self._entries), bytes=self._size)
+            return stats
+
+
+_cache = ResponseCache()
+
+_CACHED_HEADERS = ("Content-Type", "Content-Disposition")
+
+
+def _not_modified(etag, modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.headers.get("If-Modified-Since")
+    if since and modified is not None:
+        try:
+            return int(parsedate_to_datetime(since).timestamp()) >= modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _validators(response, etag, modified):
+    response.set_etag(etag, weak=True)
+    if modified is not None:
+        response.headers["Last-Modified"] = formatdate(modified, usegmt=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+"""
+Dekorator für Views, deren Antwort nur von Pfad, Argumenten und Datenstand
+abhängt. Setzt ETag/Last-Modified, beantwortet Revalidierungen mit 304 ohne
+die View aufzurufen und hält fertige 200-Antworten im LRU-Cache. Gestreamte
+Antworten (CSV-Export) werden nur revalidiert, nicht gespeichert.
+"""
+def cached_response(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not RESPONSE_CACHE or request.method != "GET":
+            return view(*args, **kwargs)
+
+        version, modified = data_version()
+        key = json.dumps([request.endpoint, kwargs, normalize_args(request.args)],
+                         sort_keys=True, default=str)
+        etag = hashlib.sha1(f"{version}|{key}".encode("utf-8")).hexdigest()
+
+        if _not_modified(etag, modified):
+            _cache.count("not_modified")
+            return _validators(make_response("", 304), etag, modified)
+
+        entry = _cache.get(version, key)
+        if entry is not None:
+            body, status, headers = entry
+            response = make_response(body, status)
+            response.headers.update(headers)
+            return _validators(response, etag, modified)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+        if not response.is_streamed:
+            headers = {h: response.headers[h] for h in _CACHED_HEADERS if h in response.headers}
+            _cache.put(version, key, (response.get_data(), 200, headers))
+        return _validators(response, etag, modified)
+    return wrapper
+
+
+def response_cache_stats():
+    return _cache.snapshot_stats()
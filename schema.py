@@ -0,0 +1,316 @@
+from db_pool import pooled_connection
+from service_catalog import classify_service
+from resource_attributes import parse_attributes, ATTRIBUTE_COLUMNS
+from units import EMPTY_TEXT_COLUMNS
+
+
+"""
+Zusätzliche Spalten der Tabelle 'cloud_prices', die beim Import befüllt werden.
+"""
+COLUMNS = {
+    "canonical_service": "ALTER TABLE cloud_prices ADD COLUMN canonical_service VARCHAR(32) NULL",
+    "row_hash":          "ALTER TABLE cloud_prices ADD COLUMN row_hash CHAR(32) NULL",
+    "family":            "ALTER TABLE cloud_prices ADD COLUMN family VARCHAR(32) NULL",
+    "vcpu":              "ALTER TABLE cloud_prices ADD COLUMN vcpu DECIMAL(7,2) NULL",
+    "memory_gib":        "ALTER TABLE cloud_prices ADD COLUMN memory_gib DECIMAL(9,2) NULL",
+    "storage_class":     "ALTER TABLE cloud_prices ADD COLUMN storage_class VARCHAR(32) NULL",
+}
+
+"""
+Zusätzliche Tabellen (werden bei Bedarf angelegt).
+"""
+TABLES = {
+    "price_facets": """
+        CREATE TABLE IF NOT EXISTS price_facets (
+            facet    VARCHAR(16)  NOT NULL,
+            provider VARCHAR(20)  NOT NULL,
+            value    VARCHAR(255) NOT NULL,
+            cnt      INT          NOT NULL,
+            PRIMARY KEY (facet, provider, value)
+        )
+    """,
+}
+
+"""
+Sekundärindizes der Tabelle 'cloud_prices'. Die Volltext-Indizes nutzen den
+ngram-Parser, damit auch Teilwörter (z. B. "d2s" in "Standard_D2s_v3") gefunden werden.
+Sie werden ohne Stoppwortliste angelegt (siehe _FULLTEXT_SESSION).
+Die idx_sort_*-Indizes decken die Keyset-Sortierungen (Spalte(n) + id) ab;
+region, instance_type und sku nutzen idx_region/idx_instance_type/idx_sku
+(InnoDB hängt den Primärschlüssel id an jeden Sekundärindex an).
+"""
+INDEXES = {
+    "idx_provider_service": "CREATE INDEX idx_provider_service ON {table} (provider, service)",
+    "idx_canonical_service": "CREATE INDEX idx_canonical_service ON {table} (canonical_service, provider)",
+    "idx_provider_price":   "CREATE INDEX idx_provider_price ON {table} (provider, price_per_unit)",
+    "idx_region":           "CREATE INDEX idx_region ON {table} (region)",
+    "idx_instance_type":    "CREATE INDEX idx_instance_type ON {table} (instance_type)",
+    "idx_sku":              "CREATE INDEX idx_sku ON {table} (sku)",
+    "idx_sort_provider":    "CREATE INDEX idx_sort_provider ON {table} (provider, sku, id)",
+    "idx_sort_service":     "CREATE INDEX idx_sort_service ON {table} (service, id)",
+    "idx_sort_resource_name": "CREATE INDEX idx_sort_resource_name ON {table} (resource_name, id)",
+    "idx_sort_price":       "CREATE INDEX idx_sort_price ON {table} (price_per_unit, id)",
+    "idx_family":           "CREATE INDEX idx_family ON {table} (family, provider)",
+    "idx_vcpu_memory":      "CREATE INDEX idx_vcpu_memory ON {table} (vcpu, memory_gib)",
+    "idx_storage_class":    "CREATE INDEX idx_storage_class ON {table} (storage_class, provider)",
+    "ft_search":            "CREATE FULLTEXT INDEX ft_search ON {table} (sku, resource_name) WITH PARSER ngram",
+    "ft_resource_name":     "CREATE FULLTEXT INDEX ft_resource_name ON {table} (resource_name) WITH PARSER ngram",
+}
+
+
+"""
+Beim Anlegen eines FULLTEXT-Index übernimmt InnoDB die Stoppwortliste der
+Sitzung. Mit der Standardliste fallen beim ngram-Parser alle Tokens weg, die
+ein Stoppwort enthalten (z. B. "an" in "Standard", "in" in "Linux") – solche
+Teilwörter wären nicht mehr auffindbar. Bestehende Indizes behalten ihre
+Liste, bis sie neu aufgebaut werden (DROP INDEX + ensure_schema; im
+REFRESH_MODE=swap geschieht das bei jedem Lauf).
+"""
+_FULLTEXT_SESSION = "SET SESSION innodb_ft_enable_stopword = OFF"
+
+
+"""
+Liest die vorhandenen Indexnamen einer Tabelle aus information_schema.
+"""
+def _existing_indexes(cursor, table):
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {r[0] for r in cursor.fetchall()}
+
+
+"""
+Liest die vorhandenen Spaltennamen einer Tabelle aus information_schema.
+"""
+def _existing_columns(cursor, table):
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {r[0] for r in cursor.fetchall()}
+
+
+"""
+Berechnet 'canonical_service' für Bestandszeilen (einmalig nach dem Anlegen der Spalte).
+"""
+def backfill_canonical_service(batch_size=5000):
+    updated = 0
+    last_id = 0
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        while True:
+            cursor.execute("""
+                SELECT id, provider, service, sku, resource_name, instance_type
+                FROM cloud_prices
+                WHERE id > %s AND canonical_service IS NULL
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            pairs = [(key, r["id"]) for r in rows
+                     for key in [classify_service(r["provider"], r)] if key]
+            if pairs:
+                cursor.executemany("UPDATE cloud_prices SET canonical_service = %s WHERE id = %s", pairs)
+                connection.commit()
+                updated += len(pairs)
+        cursor.close()
+    return updated
+
+
+"""
+Berechnet family, vcpu, memory_gib und storage_class für Bestandszeilen
+(einmalig nach dem Anlegen der Spalten, aus den gespeicherten Textfeldern).
+"""
+def backfill_attributes(batch_size=5000):
+    updated = 0
+    last_id = 0
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        while True:
+            cursor.execute("""
+                SELECT id, provider, service, sku, resource_name, instance_type, canonical_service
+                FROM cloud_prices
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            params = []
+            for r in rows:
+                attrs = parse_attributes(r["provider"], r)
+                if any(v is not None for v in attrs.values()):
+                    params.append(tuple(attrs[c] for c in ATTRIBUTE_COLUMNS) + (r["id"],))
+            if params:
+                cursor.executemany("""
+                    UPDATE cloud_prices SET family = %s, vcpu = %s, memory_gib = %s, storage_class = %s
+                    WHERE id = %s
+                """, params)
+                connection.commit()
+                updated += len(params)
+        cursor.close()
+    return updated
+
+
+"""
+Ersetzt NULL in den Sortierspalten (units.EMPTY_TEXT_COLUMNS) durch ''.
+Zeilen, die dabei mit einer bestehenden ''-Zeile kollidieren würden, sind
+Dubletten unter dem eindeutigen Schlüssel und werden entfernt.
+"""
+def backfill_empty_text(cursor):
+    changed = 0
+    for column in EMPTY_TEXT_COLUMNS:
+        cursor.execute(f"UPDATE IGNORE cloud_prices SET {column} = '' WHERE {column} IS NULL")
+        changed += cursor.rowcount
+        cursor.execute(f"DELETE FROM cloud_prices WHERE {column} IS NULL")
+        changed += cursor.rowcount
+    return changed
+
+
+"""
+Legt fehlende Spalten und Indizes an (idempotent, kann vor jedem Update laufen).
+Gibt die Namen der neu angelegten Spalten und Indizes zurück.
+"""
+def ensure_schema():
+    created = []
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        columns = _existing_columns(cursor, "cloud_prices")
+        for name, ddl in COLUMNS.items():
+            if name in columns:
+                continue
+            print(f"Schema: lege Spalte {name} an …")
+            cursor.execute(ddl)
+            created.append(name)
+        existing = _existing_indexes(cursor, "cloud_prices")
+        cursor.execute(_FULLTEXT_SESSION)
+        for name, ddl in INDEXES.items():
+            if name in existing:
+                continue
+            print(f"Schema: lege Index {name} an …")
+            cursor.execute(ddl.format(table="cloud_prices"))
+            created.append(name)
+        for ddl in TABLES.values():
+            cursor.execute(ddl)
+        changed = backfill_empty_text(cursor)
+        connection.commit()
+        if changed:
+            print(f"Schema: {changed} NULL-Werte in Sortierspalten durch '' ersetzt")
+        cursor.close()
+
+    if "canonical_service" in created:
+        print(f"Schema: canonical_service für {backfill_canonical_service()} Bestandszeilen berechnet")
+    if "family" in created:
+        print(f"Schema: Attribute für {backfill_attributes()} Bestandszeilen berechnet")
+    return created
+
+
+"""
+Schattentabelle für REFRESH_MODE=swap: ein Lauf schreibt in SHADOW_TABLE,
+danach wird sie per RENAME TABLE atomar gegen 'cloud_prices' getauscht.
+Die ids bleiben stabil (Links auf /alternatives/<id>, Vergleich, API): neue
+Zeilen erhalten ids oberhalb des Bestands, vor dem Tausch übernimmt jede Zeile
+die id ihrer Vorgängerin mit gleicher Identität (wie delta.row_key).
+"""
+SHADOW_TABLE = "cloud_prices_shadow"
+_OLD_TABLE = "cloud_prices_old"
+
+"""
+Spalten, die beim Übernehmen von Bestandszeilen kopiert werden
+"""
+_COPY_COLUMNS = ("id, provider, instance_type, service, sku, resource_name, region, "
+                 "price_per_unit, unit, currency, canonical_service, family, vcpu, memory_gib, "
+                 "storage_class, row_hash")
+
+
+"""
+Legt eine leere Schattentabelle mit der Struktur von 'cloud_prices' an. Die
+Sekundärindizes werden entfernt und erst nach dem Laden aufgebaut (schneller
+als Index-Pflege bei jedem INSERT); der Unique-Key für das Upsert bleibt.
+"""
+def create_shadow_table():
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+        cursor.execute(f"CREATE TABLE {SHADOW_TABLE} LIKE cloud_prices")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM cloud_prices")
+        cursor.execute(f"ALTER TABLE {SHADOW_TABLE} AUTO_INCREMENT = {int(cursor.fetchone()[0])}")
+        for name in _existing_indexes(cursor, SHADOW_TABLE) & set(INDEXES):
+            cursor.execute(f"DROP INDEX {name} ON {SHADOW_TABLE}")
+        cursor.close()
+    return SHADOW_TABLE
+
+
+"""
+Übernimmt die aktuellen Zeilen eines Anbieters aus 'cloud_prices' in die
+Schattentabelle (z. B. wenn dessen Abruf fehlgeschlagen ist). Bereits
+geschriebene Teilergebnisse des Anbieters werden vorher entfernt.
+"""
+def copy_provider_rows(provider):
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"DELETE FROM {SHADOW_TABLE} WHERE provider = %s", (provider,))
+        cursor.execute(f"""
+            INSERT INTO {SHADOW_TABLE} ({_COPY_COLUMNS})
+            SELECT {_COPY_COLUMNS} FROM cloud_prices WHERE provider = %s
+        """, (provider,))
+        copied = cursor.rowcount
+        connection.commit()
+        cursor.close()
+    return copied
+
+
+"""
+Gibt den Zeilen der Schattentabelle die ids ihrer Vorgängerinnen in
+'cloud_prices' (gleicher Anbieter, Service, SKU, Name, Region und Einheit).
+Kollidiert eine id (mehrere Zeilen mit derselben Identität), behält die
+Zeile ihre neue id. Gibt die Anzahl übernommener ids zurück.
+"""
+def carry_over_ids(cursor):
+    cursor.execute(f"""
+        UPDATE IGNORE {SHADOW_TABLE} s
+        JOIN cloud_prices p
+          ON p.provider = s.provider
+         AND p.sku = s.sku
+         AND p.service = s.service
+         AND p.resource_name <=> s.resource_name
+         AND p.region <=> s.region
+         AND p.unit <=> s.unit
+        SET s.id = p.id
+        WHERE s.id <> p.id
+    """)
+    return cursor.rowcount
+
+
+"""
+Übernimmt die ids des Bestands, baut die Sekundärindizes der Schattentabelle
+auf und tauscht sie atomar mit 'cloud_prices' (ein einziges RENAME TABLE).
+Leser sehen entweder den alten oder den neuen Stand, nie eine Tabelle unter
+Schreiblast.
+"""
+def swap_shadow_table():
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        kept = carry_over_ids(cursor)
+        connection.commit()
+        print(f"Schema: {kept} ids aus 'cloud_prices' übernommen")
+        existing = _existing_indexes(cursor, SHADOW_TABLE)
+        cursor.execute(_FULLTEXT_SESSION)
+        for name, ddl in INDEXES.items():
+            if name not in existing:
+                print(f"Schema: baue Index {name} auf {SHADOW_TABLE} …")
+                cursor.execute(ddl.format(table=SHADOW_TABLE))
+        cursor.execute(f"DROP TABLE IF EXISTS {_OLD_TABLE}")
+        cursor.execute(f"RENAME TABLE cloud_prices TO {_OLD_TABLE}, {SHADOW_TABLE} TO cloud_prices")
+        cursor.execute(f"DROP TABLE {_OLD_TABLE}")
+        cursor.close()
+
+
+if __name__ == "__main__":
+    print("Neu angelegt:", ensure_schema() or "nichts")
@@ -0,0 +1,227 @@
+from db_pool import pooled_connection
+from service_catalog import canonical_service_keys
+
+
+"""
+Bekannte Provider; ein Suchbegriff, der genau einem Provider entspricht,
+wird als exakter Provider-Filter ausgewertet.
+"""
+PROVIDERS = ("AWS", "Azure", "GCP")
+
+_NGRAM_MIN_LEN = 2   # innodb ngram_token_size (Standard: 2)
+
+
+"""
+Baut einen Volltext-Ausdruck (Boolean Mode) für einen Suchbegriff: jedes Wort
+wird als Phrase gesucht, damit ngram-Treffer zusammenhängend sein müssen.
+"""
+def _fulltext_query(text):
+    words = [w.replace('"', '') for w in text.split()]
+    return " ".join(f'+"{w}"' for w in words if w)
+
+
+def _use_fulltext(text):
+    return all(len(w) >= _NGRAM_MIN_LEN for w in text.split())
+
+
+"""
+Zerlegt einen Freitext wie build_filter_clause: Wörter, die alle (je als
+Teilstring) vorkommen müssen, oder – wenn ein Wort kürzer als ein ngram ist –
+der ganze Text als ein Teilstring (LIKE '%text%'). Der Snapshot nutzt dieselbe
+Zerlegung, damit Seite und Export dieselben Zeilen liefern.
+"""
+def search_terms(text):
+    text = (text or "").strip()
+    if not text:
+        return []
+    return text.split() if _use_fulltext(text) else [text]
+
+
+"""
+Service-Bedingung: die Auswahl der Oberfläche wird auf die beim Import
+berechnete Spalte 'canonical_service' abgebildet (indizierter Gleichheitsvergleich).
+"""
+def _service_clause(provider, service):
+    keys = canonical_service_keys(provider, service)
+    if len(keys) == 1:
+        return " AND canonical_service = %s", keys
+    if keys:
+        return " AND canonical_service IN (" + ", ".join(["%s"] * len(keys)) + ")", keys
+    return " AND service = %s", [service]
+
+
+"""
+Numerische Bereichsfilter (Filtername → Spalte, Vergleich) auf den beim Import
+abgeleiteten Attributen, z. B. "mindestens 4 vCPU, höchstens 16 GiB".
+"""
+RANGE_FILTERS = {
+    "min_vcpu":   ("vcpu", ">="),
+    "max_vcpu":   ("vcpu", "<="),
+    "min_memory": ("memory_gib", ">="),
+    "max_memory": ("memory_gib", "<="),
+}
+
+
+def parse_number(value):
+    try:
+        return float(str(value).replace(",", ".")) if str(value).strip() else None
+    except (TypeError, ValueError):
+        return None
+
+
+"""
+Baut die WHERE-Bedingung (ohne 'WHERE') und die Parameter für die Filter.
+Bedeutung der Textfilter:
+  provider, region, family, storage_class – exakter Wert (Region früher Teilstring)
+  sku, instance_type – Präfix: "m5" findet "m5.large", nicht "xm5" (früher Teilstring)
+  q, resource_name   – jedes Wort muss als Teilstring vorkommen (ngram-Volltext);
+                       enthält der Text ein Wort mit nur einem Zeichen, wird der
+                       ganze Text als ein Teilstring gesucht (LIKE)
+Exakte und Präfix-Filter nutzen B-Tree-Indizes, Freitext den Volltextindex.
+"""
+def build_filter_clause(filters):
+    defaults = {
+        "provider": "", "q": "", "service": "", "sku": "",
+        "resource_name": "", "resource": "", "instance_type": "", "region": ""
+    }
+    filters = {**defaults, **(filters or {})}
+
+    query = "1=1"
+    params = []
+
+    q = (filters.get("q") or "").strip()
+    if q:
+        provider_hit = next((p for p in PROVIDERS if p.lower() == q.lower()), None)
+        if provider_hit:
+            query += " AND provider = %s"
+            params.append(provider_hit)
+        elif _use_fulltext(q):
+            query += " AND MATCH(sku, resource_name) AGAINST (%s IN BOOLEAN MODE)"
+            params.append(_fulltext_query(q))
+        else:
+            qv = f"%{q}%"
+            query += " AND (sku LIKE %s OR resource_name LIKE %s)"
+            params.extend([qv, qv])
+
+    provider = (filters.get("provider") or "").strip()
+    if provider:
+        query += " AND provider = %s"
+        params.append(provider)
+
+    instance_type = (filters.get("instance_type") or "").strip()
+    if instance_type:
+        query += " AND instance_type LIKE %s"
+        params.append(f"{instance_type}%")
+
+    service = (filters.get("service") or "").strip()
+    if service:
+        sq, sp = _service_clause(provider, service)
+        query += sq
+        params.extend(sp)
+
+    sku = (filters.get("sku") or "").strip()
+    if sku:
+        query += " AND sku LIKE %s"
+        params.append(f"{sku}%")
+
+    resource_name = (filters.get("resource_name") or "").strip()
+    if resource_name:
+        if _use_fulltext(resource_name):
+            query += " AND MATCH(resource_name) AGAINST (%s IN BOOLEAN MODE)"
+            params.append(_fulltext_query(resource_name))
+        else:
+            query += " AND resource_name LIKE %s"
+            params.append(f"%{resource_name}%")
+
+    region = (filters.get("region") or "").strip()
+    if region:
+        query += " AND region = %s"
+        params.append(region)
+
+    for name in ("family", "storage_class"):
+        value = (filters.get(name) or "").strip()
+        if value:
+            query += f" AND {name} = %s"
+            params.append(value)
+
+    for name, (column, op) in RANGE_FILTERS.items():
+        value = parse_number(filters.get(name))
+        if value is not None:
+            query += f" AND {column} {op} %s"
+            params.append(value)
+
+    return query, params
+
+
+"""
+Filterfunktion: übernimmt die Filter aus den Request-Argumenten (Web und API).
+"""
+def build_filters(args):
+    return {
+        "provider":      args.get("provider", ""),
+        "q":             args.get("q", ""),
+        "service":       args.get("service", ""),
+        "sku":           args.get("sku", ""),
+        "resource_name": args.get("resource_name", ""),
+        "resource":      args.get("resource", ""),         
+        "instance_type": args.get("instance_type", ""),
+        "region":        args.get("region", ""),
+        "family":        args.get("family", ""),
+        "storage_class": args.get("storage_class", ""),
+        "min_vcpu":      args.get("min_vcpu", ""),
+        "max_vcpu":      args.get("max_vcpu", ""),
+        "min_memory":    args.get("min_memory", ""),
+        "max_memory":    args.get("max_memory", ""),
+    }
+
+
+"""
+Typische Filterkombinationen der Oberfläche für den EXPLAIN-Check
+"""
+COMMON_FILTERS = [
+    ("Provider",                 {"provider": "AWS"}),
+    ("Provider + Region",        {"provider": "Azure", "region": "westeurope"}),
+    ("Provider + Service",       {"provider": "Azure", "service": "Virtual Machines"}),
+    ("Provider + Disk-Service",  {"provider": "Azure", "service": "Disk Storage"}),
+    ("Suche",                    {"q": "m5.large"}),
+    ("Provider + Suche",         {"provider": "AWS", "q": "m5.large"}),
+    ("Instanztyp",               {"instance_type": "m5"}),
+    ("Resource Name",            {"resource_name": "Premium SSD"}),
+    ("vCPU + RAM",               {"min_vcpu": "4", "max_memory": "16"}),
+    ("Familie",                  {"family": "m5"}),
+]
+
+
+"""
+Führt EXPLAIN für die typischen Filterkombinationen aus und gibt je Kombination
+den genutzten Index zurück. 'full_scan' ist True, wenn kein Index genutzt wird.
+"""
+def explain_common_filters(combos=COMMON_FILTERS):
+    report = []
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        for label, filters in combos:
+            where, params = build_filter_clause(filters)
+            cursor.execute(f"EXPLAIN SELECT * FROM cloud_prices WHERE {where} LIMIT %s", params + [100])
+            plan = cursor.fetchall()
+            row = plan[0] if plan else {}
+            report.append({
+                "label": label,
+                "key": row.get("key"),
+                "type": row.get("type"),
+                "rows": row.get("rows"),
+                "full_scan": row.get("type") == "ALL" or not row.get("key"),
+            })
+        cursor.close()
+    return report
+
+
+if __name__ == "__main__":
+    from db import explain_keyset_pages
+    failed = 0
+    for r in explain_common_filters() + explain_keyset_pages():
+        bad = r["full_scan"] or r.get("filesort", False)
+        status = ("FILESORT" if r.get("filesort") else "FULL SCAN") if bad else "ok"
+        failed += bad
+        print(f"{r['label']:<22} key={r['key']!s:<20} type={r['type']!s:<10} rows≈{r['rows']}  {status}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,141 @@
+import re
+
+
+"""
+Kanonische Service-Kategorien je Provider (Schlüssel in 'canonical_service')
+und die Namen, unter denen sie in der Oberfläche auswählbar sind.
+"""
+CANONICAL_SERVICES = {
+    "AWS": {
+        "ec2": "ec2",
+        "s3": "s3",
+        "ebs": "ebs",
+        "rds": "rds",
+    },
+    "Azure": {
+        "virtual machines": "virtual-machines",
+        "blob storage": "blob-storage",
+        "cloud storage": "blob-storage",
+        "disk storage": "disk-storage",
+        "sql database": "sql-database",
+    },
+    "GCP": {
+        "compute engine": "compute-engine",
+        "cloud storage": "cloud-storage",
+        "persistent disk": "persistent-disk",
+        "cloud sql": "cloud-sql",
+    },
+}
+
+"""
+Anbieterübergreifende Gruppen der kanonischen Services (für Alternativen
+über Providergrenzen hinweg).
+"""
+SERVICE_GROUPS = {
+    "ec2": "compute", "virtual-machines": "compute", "compute-engine": "compute",
+    "s3": "object-storage", "blob-storage": "object-storage", "cloud-storage": "object-storage",
+    "ebs": "block-storage", "disk-storage": "block-storage", "persistent-disk": "block-storage",
+    "rds": "database", "sql-database": "database", "cloud-sql": "database",
+}
+
+"""
+Stichwörter für Azure-Storage-Items (werden auch von azure_client genutzt)
+"""
+AZURE_BLOB_KEYWORDS = ["blob"]
+AZURE_DISK_KEYWORDS = ["disk", "managed disk", "premium ssd", "standard ssd", "standard hdd", "ultra disk"]
+
+_AWS_INSTANCE_TYPE_RE = re.compile(r"^[a-z0-9]+(\.[a-z0-9]+)?$", re.IGNORECASE)
+
+
+"""
+Gibt die kanonischen Schlüssel für eine Service-Auswahl der Oberfläche zurück
+(ohne Provider alle passenden, bei unbekanntem Service eine leere Liste).
+"""
+def canonical_service_keys(provider, service):
+    s = (service or "").strip().lower()
+    if not s:
+        return []
+    if provider:
+        key = CANONICAL_SERVICES.get(provider, {}).get(s)
+        return [key] if key else []
+    return sorted({m[s] for m in CANONICAL_SERVICES.values() if s in m})
+
+
+"""
+Prüft, ob ein Azure-Storage-Item Blob- bzw. Disk-Storage ist (Produkt- und SKU-Name).
+"""
+def is_azure_blob(product_name, sku_name):
+    text = f"{product_name or ''} {sku_name or ''}".lower()
+    return any(k in text for k in AZURE_BLOB_KEYWORDS)
+
+
+def is_azure_disk(product_name, sku_name):
+    text = f"{product_name or ''} {sku_name or ''}".lower()
+    return any(k in text for k in AZURE_DISK_KEYWORDS)
+
+
+"""
+Prüft, ob ein GCP-SKU (Compute Engine) ein Persistent-Disk-Eintrag ist.
+"""
+def is_gcp_persistent_disk(description, category):
+    category = category or {}
+    text = f"{description or ''} {category.get('resourceGroup', '')}".lower()
+    return (("persistent disk" in text) or ("pd-standard" in text) or ("pd-ssd" in text)
+            or ("balanced pd" in text) or ("hyperdisk" in text)
+            or (category.get("resourceFamily") == "Storage" and "disk" in text))
+
+
+def _aws_category(entry):
+    service = entry.get("service") or ""
+    rname = entry.get("resource_name") or ""
+    itype = entry.get("instance_type") or ""
+    sku = entry.get("sku") or ""
+    rname_u, itype_u = rname.upper(), itype.upper()
+
+    if service.startswith("Database") or "RDS" in rname_u or itype.lower().startswith("db."):
+        return "rds"
+    if (service == "Storage" or service.startswith("EBS")) \
+            and ("EBS" in rname_u or "EBS" in itype_u or "EBS" in sku.upper()):
+        return "ebs"
+    if (service == "Storage" or service.startswith("S3")) and ("S3" in rname_u or "S3" in itype_u):
+        return "s3"
+    if service.startswith("Compute") or "EC2" in rname_u or _AWS_INSTANCE_TYPE_RE.match(itype):
+        return "ec2"
+    return None
+
+
+def _azure_category(entry):
+    service = entry.get("service") or ""
+    if service == "Virtual Machines":
+        return "virtual-machines"
+    if service == "SQL Database":
+        return "sql-database"
+    if service == "Storage":
+        name = f"{entry.get('resource_name') or ''} {entry.get('instance_type') or ''}"
+        if is_azure_blob(name, entry.get("sku")):
+            return "blob-storage"
+        if is_azure_disk(name, entry.get("sku")):
+            return "disk-storage"
+    return None
+
+
+def _gcp_category(entry):
+    service = (entry.get("service") or "").lower()
+    for label, key in CANONICAL_SERVICES["GCP"].items():
+        if service.startswith(label):
+            return key
+    return None
+
+
+"""
+Ordnet einen Preiseintrag beim Import genau einer kanonischen Kategorie zu
+(gleiche Regeln wie die Client-Filter). Gibt None zurück, wenn nichts passt.
+"""
+def classify_service(provider, entry):
+    if provider == "AWS":
+        return _aws_category(entry)
+    if provider == "Azure":
+        return _azure_category(entry)
+    if provider == "GCP":
+        return _gcp_category(entry)
+    return None
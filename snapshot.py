@@ -0,0 +1,379 @@
+import os
+import time
+import bisect
+import threading
+import unicodedata
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from db_pool import pooled_connection
+from db import _normalize_sort, _sort_columns, _cursor_values, encode_cursor, decode_cursor
+from search import PROVIDERS, RANGE_FILTERS, parse_number, search_terms
+from service_catalog import canonical_service_keys
+from update_timestamp import data_stamp
+
+load_dotenv()
+
+
+"""
+Spaltenorientierter Snapshot von 'cloud_prices' für die Startseite. Texte
+liegen als Kategorien vor (Filter werden einmal je Kategorie statt je Zeile
+ausgewertet), der Preis als float64. Neu geladen wird, wenn sich
+last_updated.txt ändert; bis dahin bleibt der alte Snapshot aktiv.
+"""
+PRICE_SNAPSHOT = os.getenv("PRICE_SNAPSHOT", "1") == "1"
+
+"""
+Nach einem fehlgeschlagenen Laden wird erst nach SNAPSHOT_RETRY Sekunden
+(verdoppelt je weiterem Fehlschlag, höchstens 10 Minuten) erneut geladen;
+bis dahin nutzen die Seiten die Datenbank. Auf den ersten Ladevorgang wird
+höchstens SNAPSHOT_LOAD_WAIT Sekunden gewartet.
+"""
+SNAPSHOT_RETRY_S = float(os.getenv("SNAPSHOT_RETRY", "30"))
+SNAPSHOT_LOAD_WAIT_S = float(os.getenv("SNAPSHOT_LOAD_WAIT", "60"))
+
+_TEXT_COLUMNS = ["provider", "instance_type", "service", "canonical_service", "sku",
+                 "resource_name", "region", "unit", "currency", "family", "storage_class"]
+_NUMERIC_COLUMNS = ["price_per_unit", "vcpu", "memory_gib"]
+_COLUMNS = ["id"] + _TEXT_COLUMNS + _NUMERIC_COLUMNS
+
+"""
+Sortierschlüssel wie die Kollation utf8mb4_0900_ai_ci der Datenbank (UCA,
+Primärstufe): Groß-/Kleinschreibung und Akzente zählen nicht, Leer- und
+Satzzeichen sortieren vor Ziffern, Ziffern vor Buchstaben – in der
+Reihenfolge der UCA-Tabelle (z. B. 'a_b' < 'a-b' < 'a1' < 'ab').
+"""
+_UCA_PUNCTUATION = "\t\n\x0b\x0c\r _-,;:!?.'\"()[]{}@*/\\&#%`^+<=>|~$"
+_COLLATION_TABLE = {ord(c): chr(1 + i) for i, c in enumerate(_UCA_PUNCTUATION)}
+_COLLATION_TABLE.update({ord(str(d)): chr(0x40 + d) for d in range(10)})
+
+
+def collation_key(text):
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return text.casefold().translate(_COLLATION_TABLE)
+
+
+def _value_rank(distinct, value):
+    key = collation_key(value)
+    i = bisect.bisect_left(distinct, key)
+    return 2 * i + 1 if i < len(distinct) and distinct[i] == key else 2 * i
+
+
+class PriceSnapshot:
+
+    def __init__(self, df, stamp=None):
+        self.df = df
+        self.stamp = stamp
+        self.ids = df["id"].to_numpy()
+        self.prices = df["price_per_unit"].to_numpy(dtype="float64")
+        self.numbers = {c: df[c].to_numpy(dtype="float64") for c in _NUMERIC_COLUMNS}
+        self.codes = {c: df[c].cat.codes.to_numpy() for c in _TEXT_COLUMNS}
+        self.lower = {c: df[c].cat.categories.astype(str).str.lower() for c in _TEXT_COLUMNS}
+        self._orders = {}
+        self._ranks = {}
+        self._lock = threading.Lock()
+
+    """
+    Lädt alle Preise aus der Datenbank in einen DataFrame mit Kategorien.
+    """
+    @classmethod
+    def load(cls, stamp=None, batch_size=50000):
+        columns = {c: [] for c in _COLUMNS}
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {', '.join(_COLUMNS)} FROM cloud_prices")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for name, values in zip(_COLUMNS, zip(*rows)):
+                    columns[name].extend(values)
+            cursor.close()
+
+        df = pd.DataFrame({
+            "id": np.asarray(columns["id"], dtype="int64"),
+            **{c: pd.Categorical(columns[c]) for c in _TEXT_COLUMNS},
+            **{c: pd.to_numeric(pd.Series(columns[c], dtype="object"), errors="coerce").astype("float64")
+               for c in _NUMERIC_COLUMNS},
+        })
+        return cls(df, stamp)
+
+    def __len__(self):
+        return len(self.ids)
+
+    """
+    Maske der Zeilen, deren Kategorie die Bedingung erfüllt (test auf den
+    kleingeschriebenen Kategorien); NULL-Werte erfüllen keine Bedingung.
+    """
+    def _match(self, column, test):
+        hits = np.asarray(test(self.lower[column]), dtype=bool)
+        lut = np.append(hits, False)
+        return lut[self.codes[column]]
+
+    def _equals(self, column, value):
+        return self._match(column, lambda cats: cats == value.lower())
+
+    def _isin(self, column, values):
+        wanted = [v.lower() for v in values]
+        return self._match(column, lambda cats: cats.isin(wanted))
+
+    def _prefix(self, column, value):
+        return self._match(column, lambda cats: cats.str.startswith(value.lower()))
+
+    def _contains(self, column, value):
+        return self._match(column, lambda cats: cats.str.contains(value.lower(), regex=False))
+
+    """
+    Filter wie search.build_filter_clause (Gleichheit, Präfix, Freitext).
+    Freitext: dieselbe Zerlegung wie in der Datenbank (search.search_terms);
+    jedes Wort muss als Teilstring vorkommen, was der ngram-Phrasensuche ohne
+    Stoppwörter entspricht (schema.ensure_schema schaltet sie ab).
+    """
+    def mask(self, filters):
+        filters = filters or {}
+        mask = np.ones(len(self), dtype=bool)
+
+        q = (filters.get("q") or "").strip()
+        if q:
+            provider_hit = next((p for p in PROVIDERS if p.lower() == q.lower()), None)
+            if provider_hit:
+                mask &= self._equals("provider", provider_hit)
+            else:
+                for word in search_terms(q):
+                    mask &= self._contains("sku", word) | self._contains("resource_name", word)
+
+        provider = (filters.get("provider") or "").strip()
+        if provider:
+            mask &= self._equals("provider", provider)
+
+        instance_type = (filters.get("instance_type") or "").strip()
+        if instance_type:
+            mask &= self._prefix("instance_type", instance_type)
+
+        service = (filters.get("service") or "").strip()
+        if service:
+            keys = canonical_service_keys(provider, service)
+            mask &= self._isin("canonical_service", keys) if keys else self._equals("service", service)
+
+        sku = (filters.get("sku") or "").strip()
+        if sku:
+            mask &= self._prefix("sku", sku)
+
+        resource_name = (filters.get("resource_name") or "").strip()
+        if resource_name:
+            for word in search_terms(resource_name):
+                mask &= self._contains("resource_name", word)
+
+        region = (filters.get("region") or "").strip()
+        if region:
+            mask &= self._equals("region", region)
+
+        for name in ("family", "storage_class"):
+            value = (filters.get(name) or "").strip()
+            if value:
+                mask &= self._equals(name, value)
+
+        for name, (column, op) in RANGE_FILTERS.items():
+            value = parse_number(filters.get(name))
+            if value is not None:
+                values = self.numbers[column]
+                with np.errstate(invalid="ignore"):
+                    mask &= (values >= value) if op == ">=" else (values <= value)
+        return mask
+
+    """
+    Rang jeder Zeile nach collation_key: gleiche Schlüssel (z. B. "A"/"a")
+    bekommen denselben Rang. Ränge sind ungerade (2·i+1); ein Wert, der
+    zwischen zwei Kategorien liegt, bekommt den geraden Rang dazwischen.
+    NULL zählt wie '' (so liegt es in der Datenbank).
+    """
+    def _rank(self, column):
+        with self._lock:
+            if column in self._ranks:
+                return self._ranks[column]
+        keys = [collation_key(str(c)) for c in self.df[column].cat.categories]
+        distinct = sorted(set(keys))
+        index = {k: 2 * i + 1 for i, k in enumerate(distinct)}
+        rank = np.empty(len(keys) + 1, dtype="int64")
+        rank[:-1] = [index[k] for k in keys]
+        rank[-1] = _value_rank(distinct, "")
+        result = (rank[self.codes[column]], distinct)
+        with self._lock:
+            self._ranks[column] = result
+        return result
+
+    """
+    Sortierschlüssel-Spalten (wie db._sort_columns: Spalte(n), dann id).
+    """
+    def _sort_keys(self, sort_by):
+        cols = ["provider", "sku"] if sort_by == "provider" else [sort_by]
+        keys = []
+        for c in cols:
+            keys.append(np.nan_to_num(self.prices, nan=-np.inf) if c == "price_per_unit" else self._rank(c)[0])
+        return keys + [self.ids]
+
+    """
+    Zeilenreihenfolge für eine Sortierung (inkl. id als Tiebreaker), einmal je
+    Snapshot berechnet und gecacht.
+    """
+    def order(self, sort_by, order):
+        key = (sort_by, order)
+        with self._lock:
+            if key in self._orders:
+                return self._orders[key]
+        if order == "desc":
+            idx = self.order(sort_by, "asc")[::-1]
+        else:
+            idx = np.lexsort(self._sort_keys(sort_by)[::-1])
+        with self._lock:
+            self._orders[key] = idx
+        return idx
+
+    """
+    Gibt (rows, total) für eine Seite zurück: gefiltert, sortiert und per Offset
+    geschnitten, alles vektorisiert im Speicher.
+    """
+    def page(self, filters, sort_by=None, order="asc", page=1, per_page=100):
+        sort_by, order = _normalize_sort(sort_by, order)
+        idx = self.order(sort_by, order)
+        selected = idx[self.mask(filters)[idx]]
+        total = len(selected)
+        start = max(0, (page - 1) * per_page)
+        return self.rows(selected[start:start + per_page]), total
+
+    """
+    Anzahl der Zeilen (aufsteigende Reihenfolge), deren Sortierschlüssel kleiner
+    (bzw. mit inclusive kleiner oder gleich) als die Cursor-Werte ist. Die
+    Cursor-Werte werden wie die Spalten gerankt; gesucht wird binär.
+    """
+    def _seek_position(self, sort_by, values, inclusive):
+        cols = _sort_columns(sort_by)
+        target = []
+        for c, v in zip(cols, values):
+            if c == "price_per_unit":
+                target.append(-np.inf if v is None else float(v))
+            elif c == "id":
+                target.append(int(v))
+            else:
+                target.append(_value_rank(self._rank(c)[1], "" if v is None else str(v)))
+        target = tuple(target)
+        keys = self._sort_keys(sort_by)
+        idx = self.order(sort_by, "asc")
+        find = bisect.bisect_right if inclusive else bisect.bisect_left
+        return find(range(len(idx)), target, key=lambda i: tuple(k[idx[i]] for k in keys))
+
+    """
+    Keyset-Seite wie db.get_prices_page, mit denselben Cursorn: gesucht wird
+    nach den Sortierwerten im Cursor (nicht nach der Position einer id), daher
+    bleiben Cursor nach einem Neuladen gültig und sind zwischen Datenbank und
+    Snapshot austauschbar. Gibt (rows, next_cursor, prev_cursor) zurück.
+    """
+    def seek_page(self, filters, sort_by=None, order="asc", cursor=None, per_page=100):
+        sort_by, order = _normalize_sort(sort_by, order)
+        cols = _sort_columns(sort_by)
+        sort_key = f"{sort_by}:{order}"
+        values, direction = decode_cursor(cursor, sort_key)
+        if values is not None and len(values) != len(cols):
+            values, direction = None, "next"
+        backwards = values is not None and direction == "prev"
+
+        if values is None:
+            idx = self.order(sort_by, order)
+        else:
+            try:
+                after = (order == "asc") != backwards
+                at = self._seek_position(sort_by, values, inclusive=after)
+            except (TypeError, ValueError):
+                values, backwards = None, False
+                idx = self.order(sort_by, order)
+            else:
+                asc = self.order(sort_by, "asc")
+                idx = asc[at:] if after else asc[:at][::-1]
+        selected = idx[self.mask(filters)[idx]][:per_page + 1]
+        has_more = len(selected) > per_page
+        selected = selected[:per_page]
+        if backwards:
+            selected = selected[::-1]
+        rows = self.rows(selected)
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = encode_cursor(_cursor_values(rows[-1], cols), "next", sort_key)
+            if values is not None and (has_more or not backwards):
+                prev_cursor = encode_cursor(_cursor_values(rows[0], cols), "prev", sort_key)
+        return rows, next_cursor, prev_cursor
+
+    def rows(self, positions):
+        part = self.df.iloc[positions]
+        records = part.astype(object).where(part.notna(), None).to_dict("records")
+        for r in records:
+            r["id"] = int(r["id"])
+        return records
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_loading = None        # Event des laufenden Ladevorgangs (höchstens einer)
+_failures = 0
+_retry_at = 0.0
+
+
+def _reload(stamp, done):
+    global _snapshot, _loading, _failures, _retry_at
+    try:
+        snap = PriceSnapshot.load(stamp)
+        with _snapshot_lock:
+            _snapshot = snap
+            _failures = 0
+        print(f"Snapshot neu geladen: {len(snap)} Preise")
+    except Exception as e:
+        with _snapshot_lock:
+            _failures += 1
+            delay = min(SNAPSHOT_RETRY_S * 2 ** (_failures - 1), 600.0)
+            _retry_at = time.monotonic() + delay
+        print(f"Snapshot konnte nicht geladen werden: {e} – neuer Versuch in {delay:.0f}s")
+    finally:
+        with _snapshot_lock:
+            _loading = None
+        done.set()
+
+
+"""
+Gibt den aktuellen Snapshot zurück (None, wenn deaktiviert oder nicht ladbar).
+Geladen wird immer nur in einem Hintergrund-Thread; gleichzeitige Anfragen
+warten beim ersten Laden auf denselben Vorgang. Nach einer Aktualisierung
+bleibt bis zum Ende des Neuladens der bisherige Snapshot aktiv, nach einem
+Fehlschlag wird bis zum Ablauf des Backoffs nicht erneut geladen.
+"""
+def get_snapshot():
+    global _loading
+    if not PRICE_SNAPSHOT:
+        return None
+    stamp = data_stamp()
+    start = False
+    with _snapshot_lock:
+        current = _snapshot
+        if current is not None and current.stamp == stamp:
+            return current
+        if _loading is None and time.monotonic() >= _retry_at:
+            _loading = threading.Event()
+            start = True
+        loading = _loading
+    if start:
+        threading.Thread(target=_reload, args=(stamp, loading), daemon=True).start()
+    if current is not None or loading is None:
+        return current
+    loading.wait(SNAPSHOT_LOAD_WAIT_S)
+    with _snapshot_lock:
+        return _snapshot
+
+
+"""
+Stand des aktuell geladenen Snapshots (ohne zu laden); weicht während eines
+Neuladens vom Stand in last_updated.txt ab.
+"""
+def snapshot_version():
+    with _snapshot_lock:
+        return _snapshot.stamp if _snapshot is not None else None
@@ -0,0 +1,63 @@
+import pytest
+
+from search import COMMON_FILTERS, explain_common_filters
+
+
+"""
+Erwartete Indizes der typischen Filter und Sortierungen (EXPLAIN gegen die
+konfigurierte Datenbank). Ohne erreichbare Datenbank werden die Tests
+übersprungen.
+"""
+FILTER_KEYS = {
+    "Provider":                {"idx_provider_service", "idx_provider_price", "idx_sort_provider"},
+    "Provider + Region":       {"idx_region", "idx_provider_service", "idx_provider_price", "idx_sort_provider"},
+    "Provider + Service":      {"idx_canonical_service"},
+    "Provider + Disk-Service": {"idx_canonical_service"},
+    "Suche":                   {"ft_search"},
+    "Provider + Suche":        {"ft_search"},
+    "Instanztyp":              {"idx_instance_type"},
+    "Resource Name":           {"ft_resource_name"},
+    "vCPU + RAM":              {"idx_vcpu_memory"},
+    "Familie":                 {"idx_family"},
+}
+
+SORT_KEYS = {
+    "provider":       "idx_sort_provider",
+    "instance_type":  "idx_instance_type",
+    "service":        "idx_sort_service",
+    "sku":            "idx_sku",
+    "resource_name":  "idx_sort_resource_name",
+    "region":         "idx_region",
+    "price_per_unit": "idx_sort_price",
+}
+
+
+@pytest.fixture(scope="module")
+def database():
+    try:
+        from db_pool import pooled_connection
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM cloud_prices")
+            count = cursor.fetchone()[0]
+            cursor.close()
+    except Exception as e:
+        pytest.skip(f"keine Datenbank erreichbar: {e}")
+    if count < 2:
+        pytest.skip("cloud_prices enthält zu wenige Zeilen")
+
+
+def test_expected_keys_cover_common_filters():
+    assert set(FILTER_KEYS) == {label for label, _ in COMMON_FILTERS}
+
+
+def test_common_filters_use_expected_index(database):
+    for r in explain_common_filters():
+        assert r["key"] in FILTER_KEYS[r["label"]], r
+
+
+def test_keyset_pages_use_sort_index(database):
+    from db import explain_keyset_pages
+    for r in explain_keyset_pages():
+        assert r["key"] == SORT_KEYS[r["sort_by"]], r
+        assert not r["filesort"], r
@@ -0,0 +1,17 @@
+from pdf_report import render_table
+
+
+def _row(name):
+    return {"provider": "AWS", "instance_type": "", "service": "EC2", "sku": name, "resource_name": name,
+            "region": "eu-central-1", "price_per_unit": 0.1, "unit": "$/Stunde", "currency": "USD"}
+
+
+"""
+Zwei Berichte nacheinander mit verschiedenen Zeichen: der zweite braucht
+Glyphen, die im ersten nicht vorkamen (Schrift-Subsetting je Bericht).
+"""
+def test_reports_with_different_glyphs():
+    first, written, _ = render_table([[_row("abc")]], "abc")
+    second, written_second, _ = render_table([[_row("Zwölf"), _row("Vz-w")]], "Vz-w")
+    assert first.startswith(b"%PDF") and second.startswith(b"%PDF")
+    assert (written, written_second) == (1, 2)
@@ -0,0 +1,123 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+
+"""
+Rohe Einheiten (kleingeschrieben) → Normalform
+"""
+UNIT_KEY_MAP = {
+    "h": "hour", "hr": "hour", "hrs": "hour", "hour": "hour",
+    "s": "seconds", "sec": "seconds", "secs": "seconds", "second": "seconds", "seconds": "seconds",
+    "mo": "mo", "mon": "mo", "month": "mo", "months": "mo",
+    "giby.mo": "giby.mo",
+    "giby":    "giby.mo",
+    "giby.h":  "giby.h",
+    "gby.h": "gby.h",
+    "1 hour":  "hour",
+    "mbps": "mbps",
+    "gb-month": "giby.mo", "gb/mo": "giby.mo", "gb per month": "giby.mo",
+    "gib.mo": "giby.mo", "gib-month": "giby.mo", "gibibyte month": "giby.mo",
+    "request": "request", "requests": "request",
+    "1k requests": "1kreq", "1000 requests": "1kreq",
+    "1m requests": "1mreq", "million requests": "1mreq",
+    "min": "minutes", "minute": "minutes", "minutes": "minutes"
+}
+
+"""
+Normalform → Anzeige-Einheit in der Datenbank
+"""
+UNIT_MAP = {
+    "hour": "$/Stunde",
+    "mo":   "$/Monat",
+    "giby.mo": "$/GB/Monat",
+    "gb-mo": "$/GB/Monat",
+    "1/day": "$/Tag",
+    "giby.h":   "$/GB/Stunde",
+    "gby.h":   "$/GB/Stunde",
+    "giby":      "$/GB/Monat",
+    "gb":      "$/GB/Monat",
+    "mbps": "$/MB/s",
+    "seconds": "$/Sekunde",
+    "request": "$/Request",
+    "1kreq": "$/1k Requests",
+    "1mreq": "$/1M Requests",
+    "minutes": "$/Minute",
+    "vcpu-hour": "$/vCPU/Stunde",
+    "vcpu-months": "$/vCPU/Monat",
+    "vcpu-hours": "$/vCPU/Stunde",
+    "iops-mo": "$/IOPS/Monat"
+}
+
+"""
+Spalten eines normalisierten Preis-Batches (Reihenfolge wie im INSERT)
+"""
+COLUMNS = ["instance_type", "service", "sku", "resource_name", "region", "price_per_unit", "unit", "currency",
+           "canonical_service", "family", "vcpu", "memory_gib", "storage_class"]
+
+
+"""
+Textspalten, die als '' statt NULL gespeichert werden, damit Sortierung und
+Keyset-Seek der Preisliste direkt auf den Indizes laufen (ohne COALESCE).
+"""
+EMPTY_TEXT_COLUMNS = ["instance_type", "resource_name", "region"]
+
+
+"""
+Gibt für eine rohe Einheit die Anzeige-Einheit und den Preisfaktor zurück.
+Jede Einheit wird nur einmal ausgewertet (memoisiert).
+"""
+@lru_cache(maxsize=None)
+def normalize_unit(unit):
+    if unit is None:
+        return None, 1.0
+
+    factor = 1.0
+    # Sekunden-Rate in Stunden-Rate umrechnen
+    if unit.lower() == "seconds":
+        factor = 3600.0
+        unit = "hour"
+
+    raw = unit.lower()
+    key = UNIT_KEY_MAP.get(raw, raw)
+    return UNIT_MAP.get(key, unit), factor
+
+
+"""
+Normalisiert einen ganzen Batch von Preiseinträgen in einem Durchgang:
+Einheiten werden pro eindeutigem Wert nachgeschlagen, Preise vektorisiert
+umgerechnet und Preise ≤ 0 entfernt. Gibt einen DataFrame mit COLUMNS zurück.
+"""
+def normalize_batch(entries):
+    df = pd.DataFrame.from_records(list(entries), columns=COLUMNS)
+    if df.empty:
+        return df
+
+    # fehlende Textfelder als None (NULL) statt NaN
+    for c in COLUMNS:
+        if c != "price_per_unit":
+            df[c] = df[c].astype(object).where(df[c].notna(), None)
+    for c in EMPTY_TEXT_COLUMNS:
+        df[c] = df[c].where(df[c].notna(), "")
+
+    codes, uniques = pd.factorize(df["unit"], use_na_sentinel=False)
+    lookups = [normalize_unit(u if isinstance(u, str) else None) for u in uniques]
+    labels = np.array([label for label, _ in lookups], dtype=object)
+    factors = np.array([factor for _, factor in lookups], dtype=float)
+
+    prices = pd.to_numeric(df["price_per_unit"], errors="coerce").to_numpy(dtype=float) * factors[codes]
+    df["price_per_unit"] = prices
+    df["unit"] = labels[codes]
+
+    # Preise ≤ 0 (oder nicht lesbar) überspringen
+    return df[prices > 0.0]
+
+
+"""
+Wandelt einen normalisierten Batch in Werte-Tupel (provider + COLUMNS) für das INSERT um.
+"""
+def batch_to_rows(df, provider):
+    if df.empty:
+        return []
+    cols = [df[c].tolist() for c in COLUMNS]
+    return [(provider, *values) for values in zip(*cols)]
@@ -1,12 +1,29 @@
-import os
 from datetime import datetime
+from pathlib import Path
+
+"""
+Datei mit dem Zeitpunkt der letzten Preisaktualisierung; ihr Stand
+(Änderungszeit, Größe) kennzeichnet den Datenstand für alle Caches.
+"""
+STAMP_FILE = Path("last_updated.txt")
+
 
 """ 
 Speichert den aktuellen Zeitpunkt in einer Datei namens 'last_updated.txt'.
 Wird verwendet, um den Zeitpunkt der letzten Preisaktualisierung zu dokumentieren.
 """
 def update_timestamp():
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    path = os.path.join(base_path, "last_updated.txt")
-    with open("last_updated.txt", "w") as f:
+    with open(STAMP_FILE, "w") as f:
         f.write(datetime.now().strftime("%d.%m.%Y %H:%M:%S"))
+
+
+"""
+Stand von last_updated.txt als (st_mtime_ns, st_size), None ohne Datei.
+Snapshot, Facetten, Zähl-Cache und Antwort-Cache vergleichen diesen Wert.
+"""
+def data_stamp():
+    try:
+        st = STAMP_FILE.stat()
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None